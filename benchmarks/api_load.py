@@ -0,0 +1,146 @@
+# Description: Load test of the headless HTTP API - many concurrent streaming requests against tts-api-server.py and a local mock API.
+#
+# Usage:  python3 benchmarks/api_load.py [--streams 50] [--requests 2] [--compare benchmarks/results/api-<previous>.json]
+# Results are written to benchmarks/results/api-<commit>.json.
+
+# Import the required libraries
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+SERVER_PATH = REPO_DIR / "tts-api-server.py"
+
+from mock_elevenlabs import MockConfig, make_voices, start_mock_server  # noqa: E402
+from run_benchmarks import compare, distinct_text, git_revision, summarize  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/healthz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"tts-api-server.py did not start on port {port}")
+
+
+def stream_request(port, text, voice, client_id):
+    """
+    POST one synthesis request and read the chunked response; returns a sample like run_benchmarks.py.
+    """
+    started = time.perf_counter()
+    sample = {'ttfb': None, 'bytes': 0, 'error': None}
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        connection.request('POST', '/v1/synthesize', body=json.dumps({'text': text, 'voice': voice}),
+                           headers={'Content-Type': "application/json", 'X-Client-Id': client_id})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {response.read()[:200]}")
+        while True:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            if sample['ttfb'] is None:
+                sample['ttfb'] = time.perf_counter() - started
+            sample['bytes'] += len(chunk)
+        connection.close()
+    except Exception as e:
+        sample['error'] = str(e)
+    sample['latency'] = time.perf_counter() - started
+    return sample
+
+
+def concurrent_streams(port, streams, requests, sentences, voice):
+    samples = []
+    lock = threading.Lock()
+
+    def client(index):
+        for request in range(requests):
+            # A different text per request and sentence, so every segment has to go to the (mock) API
+            text = distinct_text(f"client {index} request {request}", sentences)
+            sample = stream_request(port, text, voice, f"client-{index}")
+            with lock:
+                samples.append(sample)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP API against a local mock ElevenLabs API.")
+    parser.add_argument('--streams', type=int, default=50, help="concurrent streaming clients")
+    parser.add_argument('--requests', type=int, default=2, help="requests per client")
+    parser.add_argument('--sentences', type=int, default=1, help="sentences per request")
+    parser.add_argument('--latency', type=float, default=0.2, help="mock latency before the first byte (s)")
+    parser.add_argument('--chunk-interval', type=float, default=0.01, help="mock pause between chunks (s)")
+    parser.add_argument('--max-in-flight', type=int, default=64, help="TTS_MAX_IN_FLIGHT of the API server")
+    parser.add_argument('--output', help="result file (default benchmarks/results/api-<commit>.json)")
+    parser.add_argument('--compare', help="previous result file to compare against")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, chunk_interval=args.chunk_interval, bytes_per_char=200)
+    server, base_url = start_mock_server(config)
+    work_dir = Path(tempfile.mkdtemp(prefix="tts-api-"))
+    port = free_port()
+    env = dict(os.environ, ELEVEN_API_BASE_URL=base_url, ELEVEN_API_KEY="benchmark", TTS_METRICS_PORT="0",
+               TTS_METRICS_LOG=str(work_dir / "synthesis.jsonl"), TTS_CACHE_DIR=str(work_dir / "cache"),
+               TTS_VOICE_SNAPSHOT=str(work_dir / "voices.json"), TTS_MAX_IN_FLIGHT=str(args.max_in_flight))
+    api = subprocess.Popen([sys.executable, str(SERVER_PATH), '--port', str(port)], env=env,
+                           stdout=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+        voice = make_voices(config.voices)[0]['name']
+        results = {
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'mock': config.as_dict(),
+            'workloads': {
+                'single': concurrent_streams(port, 1, args.requests, args.sentences, voice),
+                'concurrent': concurrent_streams(port, args.streams, args.requests, args.sentences, voice),
+            },
+        }
+    finally:
+        api.terminate()
+        api.wait()
+        server.shutdown()
+    for name, metrics in results['workloads'].items():
+        print(f"{name}: {json.dumps(metrics)}")
+
+    output = Path(args.output) if args.output else BENCHMARK_DIR / "results" / f"api-{results['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as out_file:
+        json.dump(results, out_file, indent=2)
+    print(f"\nResults saved to --> {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
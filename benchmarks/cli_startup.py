@@ -0,0 +1,146 @@
+# Description: Start-up benchmark of the CLI - how long tts-app.py takes before its first synthesis request reaches the API.
+#
+# Usage:  python3 benchmarks/cli_startup.py [--runs 5] [--compare benchmarks/results/startup-<previous>.json]
+# Results are written to benchmarks/results/startup-<commit>.json.
+
+# Import the required libraries
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+CLI_PATH = REPO_DIR / "tts-app.py"
+
+from mock_elevenlabs import MockConfig, MockRequestHandler, make_voices, start_mock_server  # noqa: E402
+from run_benchmarks import git_revision, percentile  # noqa: E402
+
+SAMPLE_TEXT = "The quick brown fox jumps over the lazy dog."
+
+
+class RecordingRequestHandler(MockRequestHandler):
+    """
+    Mock handler which remembers when each synthesis request arrived.
+    """
+    synthesis_times = []
+
+    def do_POST(self):
+        self.synthesis_times.append(time.time())
+        super().do_POST()
+
+
+def run_cli(arguments, env, stdin_text=None):
+    """
+    Run the CLI once and return (seconds until the first synthesis request or None, total seconds).
+    """
+    RecordingRequestHandler.synthesis_times.clear()
+    started = time.time()
+    result = subprocess.run([sys.executable, str(CLI_PATH)] + arguments, input=stdin_text, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total = time.time() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"tts-app.py {' '.join(arguments)} failed: {result.stderr.strip()}")
+    first_request = RecordingRequestHandler.synthesis_times[0] - started if RecordingRequestHandler.synthesis_times else None
+    return first_request, total
+
+
+def summarize(samples):
+    first_requests = [first for first, _ in samples if first is not None]
+    totals = [total for _, total in samples]
+    return {
+        'runs': len(samples),
+        'first_request_p50': percentile(first_requests, 0.50),
+        'first_request_min': min(first_requests) if first_requests else None,
+        'total_p50': percentile(totals, 0.50),
+        'total_min': min(totals),
+    }
+
+
+def compare(current, previous_path):
+    with open(previous_path, 'r') as in_file:
+        previous = json.load(in_file)
+    print(f"\nComparison against {previous_path} ({previous.get('revision')}):")
+    for scenario, metrics in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(scenario, {})
+        for metric in ('first_request_p50', 'total_p50'):
+            if metrics.get(metric) and before.get(metric):
+                change = (metrics[metric] - before[metric]) / before[metric] * 100
+                print(f"  {scenario:>14} {metric:<18} {before[metric]:>8.3f} -> {metrics[metric]:>8.3f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start-up overhead of tts-app.py against a local mock API.")
+    parser.add_argument('--runs', type=int, default=5, help="runs per scenario")
+    parser.add_argument('--latency', type=float, default=0.05, help="mock latency before the first byte (s)")
+    parser.add_argument('--output', help="result file (default benchmarks/results/startup-<commit>.json)")
+    parser.add_argument('--compare', help="previous result file to compare against")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, chunk_interval=0, bytes_per_char=100)
+    server, base_url = start_mock_server(config, handler_class=RecordingRequestHandler)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="tts-startup-"))
+    text_path = work_dir / "input.txt"
+    text_path.write_text(SAMPLE_TEXT)
+    voice_name = make_voices(config.voices)[1]['name']
+    base_env = dict(os.environ, ELEVEN_API_BASE_URL=base_url, ELEVEN_API_KEY="benchmark", TTS_STREAM_PORT="0",
+                    TTS_METRICS_PORT="0", TTS_METRICS_LOG=str(work_dir / "synthesis.jsonl"),
+                    # Keep the output files and the cleanup sweep of the CLI inside the work directory
+                    TTS_OUTPUT_DIR=str(work_dir))
+
+    def env_for(run, snapshot):
+        # A fresh synthesis cache per run, so every run has to call the API
+        return dict(base_env, TTS_CACHE_DIR=str(work_dir / f"cache-{run}"), TTS_VOICE_SNAPSHOT=str(snapshot))
+
+    warm_snapshot = work_dir / "voices.json"
+    scenarios = {
+        # Interpreter start, argument parsing and exit
+        'help': lambda run: run_cli(['--help'], env_for(run, warm_snapshot)),
+        # Scripted use: voice name resolved from the local snapshot, text from stdin
+        'voice_stdin': lambda run: run_cli(['--voice', voice_name, '-o', str(work_dir / f"out-{run}.mp3")],
+                                           env_for(run, warm_snapshot), stdin_text=SAMPLE_TEXT),
+        # Same, but without a voice snapshot (first run on a machine)
+        'voice_cold': lambda run: run_cli(['--voice', voice_name, '-o', str(work_dir / f"out-{run}.mp3")],
+                                          env_for(run, work_dir / f"voices-{run}.json"), stdin_text=SAMPLE_TEXT),
+        # Interactive voice selection, answered through stdin
+        'interactive': lambda run: run_cli(['-i', str(text_path), '-o', str(work_dir / f"out-{run}.mp3")],
+                                           env_for(run, warm_snapshot), stdin_text="2\n"),
+    }
+
+    # Populate the snapshot used by the warm scenarios
+    run_cli(['--list-voices'], env_for("warmup", warm_snapshot))
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'mock': config.as_dict(),
+        'scenarios': {},
+    }
+    run_index = 0
+    for name, scenario in scenarios.items():
+        samples = []
+        for _ in range(args.runs):
+            samples.append(scenario(run_index))
+            run_index += 1
+        results['scenarios'][name] = summarize(samples)
+        print(f"{name}: {json.dumps(results['scenarios'][name])}")
+    server.shutdown()
+
+    output = Path(args.output) if args.output else BENCHMARK_DIR / "results" / f"startup-{results['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as out_file:
+        json.dump(results, out_file, indent=2)
+    print(f"\nResults saved to --> {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Description: Local stand-in for the ElevenLabs voices and text-to-speech endpoints, used by the benchmarks.
+#
+# Run it standalone with:  python3 benchmarks/mock_elevenlabs.py --port 8600 --latency 0.3
+# and point the apps to it with:  ELEVEN_API_BASE_URL=http://127.0.0.1:8600
+
+# Import the required libraries
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-1 Layer III frame header (128 kbps, 44.1 kHz), repeated to fake audio payloads
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+class MockConfig:
+    """
+    Behaviour of the mock server; all values can be changed while the server is running.
+    """
+
+    def __init__(self, latency=0.2, chunk_size=4096, chunk_interval=0.01, error_rate=0.0,
+                 retry_after=1, bytes_per_char=1000, voices=20):
+        self.latency = latency                  # seconds before the first byte of a response
+        self.chunk_size = chunk_size            # bytes per streamed chunk
+        self.chunk_interval = chunk_interval    # seconds between two chunks
+        self.error_rate = error_rate            # fraction of synthesis requests answered with 429
+        self.retry_after = retry_after          # Retry-After header sent with the 429 responses
+        self.bytes_per_char = bytes_per_char    # size of the generated audio per input character
+        self.voices = voices                    # number of voices returned by /v1/voices
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def make_voices(count):
+    return [
+        {
+            'voice_id': f"mockvoice{index:011d}",
+            'name': f"Mock Voice {index}",
+            'category': "premade",
+            'labels': {'gender': "female" if index % 2 else "male", 'accent': "american"},
+        }
+        for index in range(count)
+    ]
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+    stats = {'voices': 0, 'synthesis': 0, 'errors': 0}
+    stats_lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0].rstrip('/') != "/v1/voices":
+            self._send_json(404, {'detail': "not found"})
+            return
+        with self.stats_lock:
+            self.stats['voices'] += 1
+        time.sleep(self.config.latency)
+        self._send_json(200, {'voices': make_voices(self.config.voices)})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].strip('/').split('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if len(path) < 3 or path[:2] != ["v1", "text-to-speech"]:
+            self._send_json(404, {'detail': "not found"})
+            return
+
+        with self.stats_lock:
+            self.stats['synthesis'] += 1
+        time.sleep(self.config.latency)
+        if random.random() < self.config.error_rate:
+            with self.stats_lock:
+                self.stats['errors'] += 1
+            self._send_json(429, {'detail': "too_many_concurrent_requests"},
+                            headers={'Retry-After': str(self.config.retry_after)})
+            return
+
+        # Stream a fake MP3 whose size is proportional to the length of the text
+        total = max(len(body.get('text', "")) * self.config.bytes_per_char, len(MP3_FRAME))
+        payload = (MP3_FRAME * (total // len(MP3_FRAME) + 1))[:total]
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for offset in range(0, total, self.config.chunk_size):
+                chunk = payload[offset:offset + self.config.chunk_size]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+                if self.config.chunk_interval:
+                    time.sleep(self.config.chunk_interval)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, data, headers=None):
+        encoded = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(config=None, host="127.0.0.1", port=0, handler_class=MockRequestHandler):
+    """
+    Start the mock server in a background thread and return (server, base_url).
+    """
+    if config is not None:
+        handler_class.config = config
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="mock-elevenlabs", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the ElevenLabs voices and text-to-speech API.")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument('--chunk-size', type=int, default=4096, help="bytes per streamed chunk")
+    parser.add_argument('--chunk-interval', type=float, default=0.01, help="seconds between chunks")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--bytes-per-char', type=int, default=1000, help="audio bytes per input character")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, chunk_size=args.chunk_size, chunk_interval=args.chunk_interval,
+                        error_rate=args.error_rate, bytes_per_char=args.bytes_per_char)
+    server, base_url = start_mock_server(config, host=args.host, port=args.port)
+    print(f"Mock ElevenLabs API listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
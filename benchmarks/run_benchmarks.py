@@ -0,0 +1,257 @@
+# Description: Offline benchmark suite - drives the synthesis code paths of the apps against the local mock API.
+#
+# Usage:  python3 benchmarks/run_benchmarks.py [--latency 0.2] [--compare benchmarks/results/<previous>.json]
+# Results are written to benchmarks/results/<commit>.json so regressions show up between commits.
+
+# Import the required libraries
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from mock_elevenlabs import MockConfig, start_mock_server  # noqa: E402
+
+SAMPLE_SENTENCE = "The quick brown fox jumps over the lazy dog while the narrator keeps a steady pace. "
+
+
+def distinct_text(tag, sentences):
+    """
+    Return a text of numbered sentences that no other request uses, so identical requests and segments
+    are neither served from the cache nor coalesced into one API call.
+    """
+    return "".join(f"Part {index} of {tag}: {SAMPLE_SENTENCE}" for index in range(sentences))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples, wall_time):
+    """
+    Aggregate per-request samples (ttfb, latency, bytes) into percentiles and throughput.
+    """
+    ttfb = [sample['ttfb'] for sample in samples if sample['ttfb'] is not None]
+    latency = [sample['latency'] for sample in samples]
+    total_bytes = sum(sample['bytes'] for sample in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample['error']),
+        'ttfb_p50': percentile(ttfb, 0.50),
+        'ttfb_p90': percentile(ttfb, 0.90),
+        'ttfb_p99': percentile(ttfb, 0.99),
+        'latency_p50': percentile(latency, 0.50),
+        'latency_p90': percentile(latency, 0.90),
+        'latency_p99': percentile(latency, 0.99),
+        'wall_time': wall_time,
+        'bytes': total_bytes,
+        'bytes_per_sec': total_bytes / wall_time if wall_time else None,
+    }
+
+
+def peak_rss_bytes():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Benchmark:
+    """
+    Runs the workloads through the same functions the CLI and the Streamlit submit handler use.
+    """
+
+    def __init__(self, output_dir, workers=4):
+        # The modules read their configuration when imported, so they are imported after the
+        # environment has been pointed to the mock server
+        from tts_cache import SynthesisCache
+        from tts_client import connection_stats, get_client
+        from tts_jobs import JobQueue
+        from tts_pipeline import synthesize_incremental, synthesize_long_text
+        from voice_catalog import VoiceCatalog
+
+        self.client = get_client()
+        self.connection_stats = connection_stats
+        self.synthesize_incremental = synthesize_incremental
+        self.synthesize_long_text = synthesize_long_text
+        self.catalog = VoiceCatalog(fetch=self.client.voices.get_all)
+        self.output_dir = Path(output_dir)
+        self.cache = SynthesisCache(directory=self.output_dir / "cache")
+        self.job_queue = JobQueue(workers=workers)
+        self.voice_id = None
+
+    def voice_catalog(self):
+        started = time.perf_counter()
+        names = self.catalog.names()
+        self.voice_id = self.catalog.resolve(names[0])
+        return {'voices': len(names), 'fetch_time': time.perf_counter() - started}
+
+    def streamlit_submit(self, text, session_id):
+        """
+        Mirror of the Streamlit submit handler: queue an incremental synthesis job and follow its stream.
+        """
+        started = time.perf_counter()
+        sample = {'ttfb': None, 'bytes': 0, 'error': None}
+        try:
+            speech_file_path = self.output_dir / f"streamlit-{session_id}-{time.time_ns()}.mp3"
+            produce = partial(self.synthesize_incremental, self.client, text=text, voice=self.voice_id,
+                              cache=self.cache, session_id=session_id, stats={})
+            job = self.job_queue.submit(produce, file_path=speech_file_path, owner=session_id)
+            if job.buffer.wait_first_chunk():
+                sample['ttfb'] = time.perf_counter() - started
+            job.buffer.wait()
+            sample['bytes'] = job.buffer.bytes_received
+        except Exception as e:
+            sample['error'] = str(e)
+        sample['latency'] = time.perf_counter() - started
+        return sample
+
+    def cli_run(self, text):
+        """
+        Mirror of tts-app.py: chunked, parallel synthesis of the whole text written to one file.
+        """
+        started = time.perf_counter()
+        sample = {'ttfb': None, 'bytes': 0, 'error': None}
+        try:
+            speech_file_path = self.output_dir / f"cli-{time.time_ns()}.mp3"
+            with open(speech_file_path, 'wb') as out_file:
+                for chunk in self.synthesize_long_text(self.client, text=text, voice=self.voice_id):
+                    if sample['ttfb'] is None:
+                        sample['ttfb'] = time.perf_counter() - started
+                    out_file.write(chunk)
+                    sample['bytes'] += len(chunk)
+        except Exception as e:
+            sample['error'] = str(e)
+        sample['latency'] = time.perf_counter() - started
+        return sample
+
+    def single(self, requests, sentences):
+        started = time.perf_counter()
+        samples = [self.streamlit_submit(distinct_text(f"single request {request}", sentences), session_id="single")
+                   for request in range(requests)]
+        return summarize(samples, time.perf_counter() - started)
+
+    def concurrent(self, sessions, requests, sentences):
+        samples = []
+        lock = threading.Lock()
+
+        def session(index):
+            for request in range(requests):
+                text = distinct_text(f"session {index} request {request}", sentences)
+                sample = self.streamlit_submit(text, session_id=f"session-{index}")
+                with lock:
+                    samples.append(sample)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(index,)) for index in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(samples, time.perf_counter() - started)
+
+    def long_text(self, chars):
+        # Numbered sentences, so every segment of the text is a separate API call
+        text = distinct_text("the long text", chars // len(SAMPLE_SENTENCE) + 1)[:chars]
+        started = time.perf_counter()
+        sample = self.cli_run(text)
+        return summarize([sample], time.perf_counter() - started)
+
+
+def compare(current, previous_path):
+    """
+    Print the relative change of the main metrics against a previous result file.
+    """
+    with open(previous_path, 'r') as in_file:
+        previous = json.load(in_file)
+    print(f"\nComparison against {previous_path} ({previous.get('revision')}):")
+    for workload, metrics in current['workloads'].items():
+        before = previous.get('workloads', {}).get(workload, {})
+        for metric in ('ttfb_p50', 'latency_p50', 'latency_p99', 'bytes_per_sec'):
+            if metrics.get(metric) and before.get(metric):
+                change = (metrics[metric] - before[metric]) / before[metric] * 100
+                print(f"  {workload:>10} {metric:<14} {before[metric]:>12.4f} -> {metrics[metric]:>12.4f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the synthesis paths against a local mock ElevenLabs API.")
+    parser.add_argument('--latency', type=float, default=0.2, help="mock latency before the first byte (s)")
+    parser.add_argument('--chunk-size', type=int, default=4096, help="mock chunk size (bytes)")
+    parser.add_argument('--chunk-interval', type=float, default=0.005, help="mock pause between chunks (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of mock responses with 429")
+    parser.add_argument('--bytes-per-char', type=int, default=200, help="mock audio bytes per character")
+    parser.add_argument('--requests', type=int, default=10, help="requests per session")
+    parser.add_argument('--sessions', type=int, default=8, help="concurrent sessions")
+    parser.add_argument('--long-chars', type=int, default=50000, help="size of the long-text workload")
+    parser.add_argument('--output', help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="previous result file to compare against")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, chunk_size=args.chunk_size, chunk_interval=args.chunk_interval,
+                        error_rate=args.error_rate, retry_after=0, bytes_per_char=args.bytes_per_char)
+    server, base_url = start_mock_server(config)
+
+    # Point the apps to the mock server and keep the persistent cache out of the measurements
+    work_dir = tempfile.mkdtemp(prefix="tts-bench-")
+    os.environ['ELEVEN_API_BASE_URL'] = base_url
+    os.environ['ELEVEN_API_KEY'] = "benchmark"
+    os.environ['TTS_STREAM_PORT'] = "0"
+    os.environ['TTS_METRICS_LOG'] = os.path.join(work_dir, "synthesis.jsonl")
+
+    # One job worker per session, so the job queue does not limit the concurrency of the workload
+    benchmark = Benchmark(output_dir=work_dir, workers=args.sessions)
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'mock': config.as_dict(),
+        'workloads': {},
+    }
+    results['voice_catalog'] = benchmark.voice_catalog()
+    print(f"Voice catalog: {results['voice_catalog']}")
+    for name, run in (
+        ('single', lambda: benchmark.single(args.requests, 3)),
+        ('concurrent', lambda: benchmark.concurrent(args.sessions, args.requests, 3)),
+        ('long_text', lambda: benchmark.long_text(args.long_chars)),
+    ):
+        results['workloads'][name] = run()
+        print(f"{name}: {json.dumps(results['workloads'][name])}")
+    results['peak_rss_bytes'] = peak_rss_bytes()
+    results['connections'] = benchmark.connection_stats()
+    results['mock_stats'] = dict(server.RequestHandlerClass.stats)
+    server.shutdown()
+
+    output = Path(args.output) if args.output else BENCHMARK_DIR / "results" / f"{results['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as out_file:
+        json.dump(results, out_file, indent=2)
+    print(f"\nPeak RSS: {results['peak_rss_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"Results saved to --> {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Description: Tests of the HTTP API against the local mock API - disconnecting callers and more streams than threads.
+
+# Import the required libraries
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(REPO_DIR / "benchmarks"))
+
+from api_load import free_port, wait_until_ready  # noqa: E402
+from mock_elevenlabs import MockConfig, MockRequestHandler, make_voices, start_mock_server  # noqa: E402
+
+
+class ApiServerTest(unittest.TestCase):
+
+    def setUp(self):
+        MockRequestHandler.stats.update(voices=0, synthesis=0, errors=0)
+        self.config = MockConfig(latency=0.2, chunk_interval=0, bytes_per_char=10)
+        self.server, base_url = start_mock_server(self.config)
+        work_dir = tempfile.mkdtemp(prefix="tts-api-test-")
+        self.port = free_port()
+        # Small segments, so a short text is many API requests made by two workers; fewer handler threads and
+        # scheduler slots than concurrent streams
+        env = dict(os.environ, ELEVEN_API_BASE_URL=base_url, ELEVEN_API_KEY="test", TTS_METRICS_PORT="0",
+                   TTS_METRICS_LOG=os.path.join(work_dir, "synthesis.jsonl"),
+                   TTS_CACHE_DIR=os.path.join(work_dir, "cache"),
+                   TTS_VOICE_SNAPSHOT=os.path.join(work_dir, "voices.json"),
+                   TTS_OUTPUT_DIR=work_dir, TTS_MAX_SEGMENT_CHARS="60", TTS_SYNTHESIS_WORKERS="2",
+                   TTS_API_WORKERS="2", TTS_MAX_IN_FLIGHT="2")
+        self.api = subprocess.Popen([sys.executable, str(REPO_DIR / "tts-api-server.py"), '--port', str(self.port)],
+                                    env=env, stdout=subprocess.DEVNULL)
+        wait_until_ready(self.port)
+
+    def tearDown(self):
+        self.api.terminate()
+        self.api.wait()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_disconnect_stops_the_segment_requests(self):
+        segments = 60
+        text = " ".join(f"This is sentence number {index} of a long document." for index in range(segments))
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        connection.request('POST', '/v1/synthesize',
+                           body=json.dumps({'text': text, 'voice': make_voices(self.config.voices)[0]['name']}),
+                           headers={'Content-Type': "application/json"})
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.read1(1024))
+        # The caller goes away after the first audio
+        connection.sock.close()
+        connection.close()
+
+        time.sleep(1.0)
+        after_disconnect = MockRequestHandler.stats['synthesis']
+        time.sleep(1.5)
+        # No new segment requests once the requests already running have finished
+        self.assertEqual(MockRequestHandler.stats['synthesis'], after_disconnect)
+        self.assertLess(after_disconnect, segments // 2)
+
+    def test_more_streams_than_threads_complete(self):
+        voice = make_voices(self.config.voices)[0]['name']
+        statuses = []
+
+        def request(index):
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=20)
+                connection.request('POST', '/v1/synthesize',
+                                   body=json.dumps({'text': f"Stream number {index}.", 'voice': voice}),
+                                   headers={'Content-Type': "application/json", 'X-Client-Id': f"client-{index}"})
+                response = connection.getresponse()
+                statuses.append((response.status, len(response.read())))
+                connection.close()
+            except Exception as e:
+                statuses.append((None, str(e)))
+
+        threads = [threading.Thread(target=request, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(statuses), 8)
+        for status, size in statuses:
+            self.assertEqual(status, 200, size)
+            self.assertGreater(size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+# Description: Tests of the output janitor - expiry, holds, quota and files that are still being written.
+
+# Import the required libraries
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tts_janitor import OutputJanitor  # noqa: E402
+
+
+class OutputJanitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def make_file(self, name, size=100, age=0.0):
+        path = self.directory / name
+        path.write_bytes(b"x" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def janitor(self, **kwargs):
+        kwargs.setdefault('max_age', 60)
+        kwargs.setdefault('max_bytes', 10 ** 9)
+        kwargs.setdefault('hold_ttl', 60)
+        kwargs.setdefault('temp_max_age', 3600)
+        janitor = OutputJanitor(directory=self.directory, **kwargs)
+        janitor.scan()
+        return janitor
+
+    def test_expired_files_are_deleted(self):
+        old = self.make_file("speech-old.mp3", age=120)
+        new = self.make_file("speech-new.mp3", age=10)
+        self.janitor().sweep()
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_other_files_are_left_alone(self):
+        placeholder = self.make_file("test", age=10 ** 6)
+        cache = self.make_file("voices.json", age=10 ** 6)
+        self.janitor().sweep()
+        self.assertTrue(placeholder.exists())
+        self.assertTrue(cache.exists())
+
+    def test_held_file_is_kept_until_released(self):
+        path = self.make_file("speech-held.mp3", age=120)
+        janitor = self.janitor()
+        janitor.hold(path, owner="session")
+        janitor.sweep()
+        self.assertTrue(path.exists())
+        janitor.release("session")
+        janitor.sweep()
+        self.assertFalse(path.exists())
+
+    def test_temp_file_being_written_is_not_deleted(self):
+        path = self.make_file(".speech-long.mp3.part", age=0)
+        janitor = self.janitor(max_age=0.2, temp_max_age=0.5)
+        for _ in range(4):
+            time.sleep(0.3)
+            # The writer keeps appending, so the file never goes stale
+            with open(path, 'ab') as out_file:
+                out_file.write(b"y")
+            janitor.sweep()
+        self.assertTrue(path.exists())
+
+    def test_stale_temp_file_is_deleted(self):
+        path = self.make_file(".speech-crashed.mp3.part", age=7200)
+        fresh = self.make_file(".speech-running.mp3.part", age=120)
+        self.janitor().sweep()
+        self.assertFalse(path.exists())
+        self.assertTrue(fresh.exists())
+
+    def test_file_modified_after_indexing_gets_a_new_expiry(self):
+        path = self.make_file("speech-rewritten.mp3", age=120)
+        janitor = self.janitor()
+        # Rewritten after the scan, e.g. by another process
+        os.utime(path, None)
+        janitor.sweep()
+        self.assertTrue(path.exists())
+        self.assertEqual(janitor.stats()['files'], 1)
+
+    def test_quota_removes_the_oldest_files_but_no_temp_files(self):
+        oldest = self.make_file("speech-1.mp3", size=400, age=50)
+        newest = self.make_file("speech-2.mp3", size=400, age=5)
+        temp = self.make_file(".speech-3.mp3.part", size=400, age=55)
+        janitor = self.janitor(max_bytes=1000)
+        janitor.sweep()
+        self.assertFalse(oldest.exists())
+        self.assertTrue(newest.exists())
+        self.assertTrue(temp.exists())
+
+    def test_quota_skips_held_files(self):
+        oldest = self.make_file("speech-1.mp3", size=400, age=50)
+        middle = self.make_file("speech-2.mp3", size=400, age=20)
+        newest = self.make_file("speech-3.mp3", size=400, age=5)
+        janitor = self.janitor(max_bytes=1000)
+        janitor.hold(oldest, owner="session")
+        janitor.sweep()
+        self.assertTrue(oldest.exists())
+        self.assertFalse(middle.exists())
+        self.assertTrue(newest.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
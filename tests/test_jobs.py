@@ -0,0 +1,56 @@
+# Description: Tests of the synthesis job queue - finished jobs keep their file exactly as long as they are listed.
+
+# Import the required libraries
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# Keep the timing log of the synthesis path out of the checkout
+os.environ.setdefault('TTS_METRICS_LOG', os.path.join(tempfile.mkdtemp(), "synthesis.jsonl"))
+
+import tts_jobs  # noqa: E402
+from tts_janitor import OutputJanitor  # noqa: E402
+
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        # A janitor of its own, which is not started - sweep() is called by the tests
+        self.janitor = OutputJanitor(self.directory, max_age=0, hold_ttl=0.2)
+        patcher = mock.patch.object(tts_jobs, 'get_janitor', return_value=self.janitor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_job(self, queue):
+        job = queue.submit(lambda: iter([b"audio"]), file_path=self.directory / "speech-1.mp3")
+        job.buffer.wait(timeout=5)
+        while job.active:
+            time.sleep(0.01)
+        return job
+
+    def test_finished_job_holds_its_file_for_the_retention(self):
+        queue = tts_jobs.JobQueue(workers=1, retention=1.0)
+        job = self.run_job(queue)
+        # The hold taken at submit (hold_ttl) has ended, the one of the finished job has not
+        time.sleep(0.3)
+        self.janitor.sweep()
+        self.assertTrue(job.file_path.exists())
+        self.assertIs(queue.get(job.job_id), job)
+
+    def test_get_expires_finished_jobs_and_releases_their_file(self):
+        queue = tts_jobs.JobQueue(workers=1, retention=0.2)
+        job = self.run_job(queue)
+        time.sleep(0.3)
+        self.assertIsNone(queue.get(job.job_id))
+        self.janitor.sweep()
+        self.assertFalse(job.file_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
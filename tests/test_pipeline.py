@@ -0,0 +1,154 @@
+# Description: Tests of the segment pipeline - sentence splitting, ordering and cancellation of abandoned documents.
+
+# Import the required libraries
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# Keep the timing log of the synthesis path out of the checkout
+os.environ.setdefault('TTS_METRICS_LOG', os.path.join(tempfile.mkdtemp(), "synthesis.jsonl"))
+
+from tts_pipeline import join_segments, map_ordered, split_segments, split_sentences, synthesize_long_text  # noqa: E402
+
+
+class FakeClient:
+    """
+    Stand-in for the ElevenLabs client which counts its calls and takes a while per request.
+    """
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, text, voice, model, output_format="mp3_44100_128"):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return iter([text.encode('utf-8')])
+
+
+class StreamingClient(FakeClient):
+    """
+    Fake client which sends the audio in two chunks, the second one only after delay seconds.
+    """
+
+    def generate(self, text, voice, model, output_format="mp3_44100_128"):
+        with self._lock:
+            self.calls += 1
+        yield text[:5].encode('utf-8')
+        time.sleep(self.delay)
+        yield text[5:].encode('utf-8')
+
+
+class SplitSentencesTest(unittest.TestCase):
+
+    def test_sentences_keep_their_punctuation_and_quotes(self):
+        self.assertEqual(split_sentences('He said "Stop!" Then he left. Did he? Yes.'),
+                         ['He said "Stop!"', 'Then he left.', 'Did he?', 'Yes.'])
+
+    def test_abbreviations_stay_with_the_following_words(self):
+        self.assertEqual(split_segments("Mr. Smith went to Washington."), ["Mr. Smith went to Washington."])
+        self.assertEqual(split_sentences("Dr. Jones met Prof. Lee at St. Mary's. They talked, e.g. about the weather."),
+                         ["Dr. Jones met Prof. Lee at St. Mary's.", "They talked, e.g. about the weather."])
+
+    def test_initials_stay_with_the_following_words(self):
+        self.assertEqual(split_sentences("J. R. R. Tolkien wrote it. The U.S. edition came later."),
+                         ["J. R. R. Tolkien wrote it.", "The U.S. edition came later."])
+
+
+class JoinSegmentsTest(unittest.TestCase):
+
+    def test_wav_header_goes_out_with_the_first_audio(self):
+        chunks = join_segments([[b"\x01\x00" * 4], [b"\x02\x00" * 4]], output_format="wav_24000")
+        first = next(chunks)
+        self.assertEqual(first[:4], b"RIFF")
+        self.assertEqual(len(first), 44 + 8)
+        self.assertEqual(b"".join(chunks), b"\x02\x00" * 4)
+
+    def test_wav_error_of_the_first_request_comes_before_any_byte(self):
+        def failing():
+            raise RuntimeError("401 invalid key")
+            yield b""
+
+        chunks = join_segments([failing()], output_format="wav_24000")
+        with self.assertRaises(RuntimeError):
+            next(chunks)
+
+
+class MapOrderedTest(unittest.TestCase):
+
+    def test_results_keep_the_input_order(self):
+        def slow_square(value):
+            time.sleep(0.01 * (5 - value % 5))
+            return value * value
+
+        self.assertEqual(list(map_ordered(slow_square, range(20), max_workers=4)), [v * v for v in range(20)])
+
+    def test_only_a_window_is_submitted_ahead(self):
+        started = []
+        release = threading.Event()
+
+        def blocked(value):
+            started.append(value)
+            release.wait(5)
+            return value
+
+        results = map_ordered(blocked, range(100), max_workers=2)
+        consumer = threading.Thread(target=lambda: next(results))
+        consumer.start()
+        time.sleep(0.2)
+        release.set()
+        consumer.join()
+        results.close()
+        # 2 running plus 2 queued at the time of the first result, plus the refill
+        self.assertLessEqual(len(started), 6)
+
+    def test_failure_cancels_the_queued_items(self):
+        calls = []
+
+        def fail_first(value):
+            calls.append(value)
+            if value == 0:
+                raise ValueError("boom")
+            time.sleep(0.05)
+            return value
+
+        with self.assertRaises(ValueError):
+            list(map_ordered(fail_first, range(50), max_workers=2))
+        time.sleep(0.3)
+        self.assertLessEqual(len(calls), 4)
+
+
+class SynthesizeLongTextTest(unittest.TestCase):
+
+    def test_closing_early_stops_the_api_calls(self):
+        client = FakeClient(delay=0.1)
+        text = " ".join(f"This is sentence number {index} of the document." for index in range(40))
+        chunks = synthesize_long_text(client, text=text, voice="voice", max_workers=3, max_chars=60)
+        next(chunks)
+        started = time.time()
+        chunks.close()
+        self.assertLess(time.time() - started, 0.5)
+        time.sleep(0.5)
+        # At most the window of segments was requested, not the whole document
+        self.assertLessEqual(client.calls, 8)
+
+    def test_first_segment_is_streamed(self):
+        client = StreamingClient(delay=0.3)
+        text = "This is the first sentence. This is the second sentence."
+        chunks = synthesize_long_text(client, text=text, voice="voice", max_workers=2, max_chars=30)
+        started = time.time()
+        first = next(chunks)
+        # The first chunk is passed on before the rest of the first segment has arrived
+        self.assertLess(time.time() - started, 0.2)
+        self.assertEqual(first + b"".join(chunks), b"This is the first sentence.This is the second sentence.")
+
+
+if __name__ == "__main__":
+    unittest.main()
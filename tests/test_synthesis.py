@@ -0,0 +1,93 @@
+# Description: Tests of the shared synthesis path - requests of different API key tenants are kept apart.
+
+# Import the required libraries
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# Keep the timing log of the synthesis path out of the checkout
+os.environ.setdefault('TTS_METRICS_LOG', os.path.join(tempfile.mkdtemp(), "synthesis.jsonl"))
+
+from tts_scheduler import SynthesisScheduler  # noqa: E402
+from tts_synthesis import synthesis_key, synthesize  # noqa: E402
+
+
+class FakeClient:
+    """
+    Stand-in for the ElevenLabs client of one API key, counting its calls.
+    """
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def generate(self, text, voice, model, output_format="mp3_44100_128"):
+        self.calls += 1
+        time.sleep(self.delay)
+        return iter([text.encode('utf-8')])
+
+
+class FakeTenant:
+
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.scheduler = SynthesisScheduler(max_in_flight=1)
+
+
+class TenantIsolationTest(unittest.TestCase):
+
+    def test_keys_differ_per_tenant(self):
+        first, second = FakeTenant("a"), FakeTenant("b")
+        self.assertNotEqual(synthesis_key("Hello.", "voice", tenant=first), synthesis_key("Hello.", "voice", tenant=second))
+        self.assertEqual(synthesis_key("Hello.", "voice", tenant=first), synthesis_key("Hello. ", "voice", tenant=first))
+
+    def test_identical_requests_of_two_tenants_are_not_shared(self):
+        tenants = [FakeTenant("a"), FakeTenant("b")]
+        clients = [FakeClient(), FakeClient()]
+        results = [None, None]
+
+        def run(index):
+            results[index] = b"".join(synthesize(clients[index], text="Same text for both keys.", voice="voice",
+                                                 tenant=tenants[index]))
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Each key made (and is billed for) its own request, on its own scheduler
+        self.assertEqual([client.calls for client in clients], [1, 1])
+        self.assertEqual([tenant.scheduler.stats()['requests'] for tenant in tenants], [1, 1])
+        self.assertEqual(results, [b"Same text for both keys."] * 2)
+
+    def test_errors_of_one_tenant_do_not_reach_another(self):
+        class FailingClient(FakeClient):
+            def generate(self, text, voice, model, output_format="mp3_44100_128"):
+                time.sleep(self.delay)
+                raise RuntimeError("401 invalid key")
+
+        results = {}
+
+        def run(name, client, tenant):
+            try:
+                results[name] = b"".join(synthesize(client, text="Shared text.", voice="voice", tenant=tenant))
+            except Exception as e:
+                results[name] = e
+
+        threads = [threading.Thread(target=run, args=("a", FailingClient(), FakeTenant("a"))),
+                   threading.Thread(target=run, args=("b", FakeClient(), FakeTenant("b")))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsInstance(results["a"], RuntimeError)
+        self.assertEqual(results["b"], b"Shared text.")
+
+
+if __name__ == "__main__":
+    unittest.main()
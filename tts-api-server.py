@@ -0,0 +1,29 @@
+# Description: Headless Text-2-Speech HTTP API for backend services, using the same synthesis path as the CLI and the Streamlit apps.
+#
+# Usage:  python3 tts-api-server.py [--host 127.0.0.1] [--port 8600]
+#
+#   curl -N -X POST http://127.0.0.1:8600/v1/synthesize -d '{"text": "Hello!", "voice": "Rachel"}' -o hello.mp3
+#   curl http://127.0.0.1:8600/v1/voices
+
+# Import the required libraries
+import argparse
+import warnings
+from dotenv import load_dotenv
+
+# Suppress DeprecationWarning
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+# Load environment variables from .env file (before the modules below read their configuration)
+load_dotenv()
+
+from tts_api import API_HOST, API_PORT, serve  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Serve text to speech over HTTP using the ElevenLabs API.")
+parser.add_argument('--host', default=API_HOST, help=f"address to listen on (default: TTS_API_HOST or {API_HOST})")
+parser.add_argument('--port', type=int, default=API_PORT, help=f"port to listen on (default: TTS_API_PORT or {API_PORT})")
+args = parser.parse_args()
+
+try:
+    serve(host=args.host, port=args.port)
+except KeyboardInterrupt:
+    print("\n*** Text-2-Speech API stopped")
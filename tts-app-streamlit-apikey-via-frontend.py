@@ -7,6 +7,16 @@ import warnings
 from dotenv import load_dotenv
 from datetime import datetime
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from tts_cache import get_cache
+from tts_pipeline import synthesize_incremental
+from tts_audio import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, PLAYABLE_FORMATS, finalizer_for
+from tts_tenants import get_tenants
+from tts_stream import file_url, get_media_server, start_stream, stream_url
+from tts_storage import new_output_path, write_atomic
+from tts_metrics import get_metrics_server
+from tts_janitor import get_janitor
+from tts_previews import PREVIEWS_ENABLED, get_previews
 
 # Suppress DeprecationWarning
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -24,6 +34,11 @@ st.set_page_config(
     }
 )
 
+# Expose the Prometheus-style synthesis metrics next to the Streamlit server (started once per process)
+get_metrics_server()
+# Expired audio files are removed by a background thread instead of a sweep on every rerun
+get_janitor()
+
 # Streamlit app interface
 st.title('Text to Speech Generator using ElevenLabs API')
 
@@ -47,8 +62,10 @@ if key_entered:
 # Now we check if the API key is in the session state before making any API calls
 if 'elevenlabs_api_key' in st.session_state and st.session_state['elevenlabs_api_key']:
     try:
-        from elevenlabs.client import ElevenLabs
-        client = ElevenLabs(api_key=st.session_state['elevenlabs_api_key'])
+        # Client and voice catalog are kept per API key in the process-wide tenant registry (indexed by a hash
+        # of the key), so all sessions and reruns using the same key share them instead of rebuilding them
+        tenant = get_tenants().get(st.session_state['elevenlabs_api_key'])
+        client = tenant.client
         
         # Test API connection by fetching voices
         try:
@@ -56,60 +73,114 @@ if 'elevenlabs_api_key' in st.session_state and st.session_state['elevenlabs_api
             # Initialize an empty list to hold the voice names for Streamlit dropdown menu options
             voice_names = []
 
-            # List all available Elevenlabs voices and add their names to the dropdown options
-            supported_voices = client.voices.get_all()
-            for voice in supported_voices.voices:
-                voice_names.append(voice.name)
+            # List all available Elevenlabs voices and add their names to the dropdown options.
+            # The catalog of the tenant is fetched once per key, reruns are served from memory instead of the API
+            voice_catalog = tenant.catalog
+            voice_names = voice_catalog.names()
+            tenant_stats = tenant.stats()
+            st.sidebar.caption(f"This API key: {tenant_stats['syntheses']} conversions, "
+                               f"{tenant_stats['characters']} characters, {tenant_stats['lookups']} reruns")
 
             # Dropdown menu for voice selection
             selected_voice = st.selectbox("Choose a voice for speech generation:", voice_names)
+            # Preview of the selected voice if one was rendered already (e.g. by tts-app-streamlit.py for the
+            # premade voices); previews are not rendered here, as that would use the quota of the user's key
+            if PREVIEWS_ENABLED:
+                preview_path = get_previews().get(voice_catalog.get(selected_voice))
+                if preview_path is not None and preview_path.exists():
+                    st.audio(preview_path.read_bytes(), format='audio/mpeg')
 
             # Text area for user input
             user_input_text = st.text_area("Enter the text you want to convert to speech:", height=150)
 
+            # Output format and bitrate of the generated file, PCM based formats can be cleaned up after synthesis
+            output_format = OUTPUT_FORMATS[st.selectbox("Audio format:", PLAYABLE_FORMATS,
+                                                        index=PLAYABLE_FORMATS.index(DEFAULT_OUTPUT_FORMAT)
+                                                        if DEFAULT_OUTPUT_FORMAT in PLAYABLE_FORMATS else 0,
+                                                        format_func=lambda name: OUTPUT_FORMATS[name].label)]
+            postprocess = st.checkbox("Clean up the audio (trim silence, normalize loudness)",
+                                      disabled=output_format.codec != 'pcm', help="Available for the WAV formats")
+
+            # Streaming playback starts the audio player as soon as the first chunks arrive (needs the local media server)
+            media_server = get_media_server()
+            stream_playback = st.toggle("Stream playback while the speech is generated",
+                                        value=media_server is not None, disabled=media_server is None)
+
             # Submit button to convert the text to speech
             submit = st.button('Convert to Speech')
 
             if submit and user_input_text:
                 # Process the conversion
                 try:
-                    # Get the current date and time for filename uniqueness
-                    now = datetime.now()
-                    date_string = now.strftime("%Y-%m-%d_%H-%M")
-                    
-                    # Create directory if it doesn't exist
-                    speech_file_directory = Path(__file__).parent / "audio-outputs"
-                    speech_file_directory.mkdir(parents=True, exist_ok=True)
-                    
-                    speech_file_path = speech_file_directory / f"speech-{date_string}.mp3"
-
-                    # Generate the speech audio using Elevenlabs API from the provided text
-                    response = client.generate(
+                    # Every job gets its own file, so sessions converting at the same time never overwrite each other
+                    speech_file_path = new_output_path(extension=output_format.extension)
+
+                    # Generate the speech audio using Elevenlabs API from the provided text; sentences synthesized
+                    # before (e.g. when the text was only edited) are served from the local cache
+                    synthesis_stats = {}
+                    response = synthesize_incremental(
+                        client,
                         text=user_input_text,
-                        voice=selected_voice,
-                        model="eleven_multilingual_v2"
+                        voice=voice_catalog.resolve(selected_voice),
+                        cache=get_cache(),
+                        # Requests of concurrent sessions are queued fairly by the scheduler
+                        session_id=get_script_run_ctx().session_id,
+                        stats=synthesis_stats,
+                        output_format=output_format.name,
+                        postprocess=postprocess and output_format.codec == 'pcm',
+                        # The requests count against the limits of this API key and are never shared with other keys
+                        tenant=tenant
                     )
-
-                    # Save the response to a file
-                    with open(speech_file_path, 'wb') as out_file:
-                        for chunk in response:
-                            out_file.write(chunk)
-
-                    st.success("The audio file has been created successfully.")
-
-                    # Provide a link for the user to download the MP3 file
-                    with open(speech_file_path, 'rb') as audio_file:
-                        audio_data = audio_file.read()
-
-                    st.download_button(
-                        label="Download Speech File",
-                        data=audio_data,
-                        file_name=speech_file_path.name,
-                        mime="audio/mp3"
-                    )
-                    
-                    # Display an audio player option to listen to the generated speech
-                    st.audio(audio_data, format='audio/mp3', start_time=0)
+                    tenant.record_synthesis(user_input_text)
+                    # Keep the file of this session until it is replaced by the next one or the session goes away
+                    get_janitor().hold(speech_file_path, owner=get_script_run_ctx().session_id)
+
+                    if stream_playback:
+                        # Relay the chunks to the player while they are written to disk in the background
+                        stream_id, stream_buffer = start_stream(response, file_path=speech_file_path,
+                                                                 mime=output_format.mime,
+                                                                 finalize=finalizer_for(output_format))
+                        if stream_buffer.wait_first_chunk():
+                            st.audio(stream_url(stream_id), format=output_format.mime, start_time=0)
+                            st.caption(f"Time to first audio: {stream_buffer.time_to_first_chunk() * 1000:.0f} ms")
+
+                        # Wait for the rest of the audio, this re-raises any error of the synthesis
+                        stream_buffer.wait()
+                        get_janitor().track(speech_file_path)
+                        st.success("The audio file has been created successfully.")
+                        st.caption(f"Re-used {synthesis_stats['reused']} of {synthesis_stats['segments']} sentences, "
+                                   f"{synthesis_stats['chars_synthesized']} characters synthesized")
+
+                        # Provide a link for the user to download the audio file, served from disk by the media server
+                        st.link_button("Download Speech File", file_url(speech_file_path, download=True))
+                    else:
+                        # Save the response to a file
+                        synthesis_started = time.time()
+                        write_atomic(speech_file_path, response, finalize=finalizer_for(output_format))
+                        get_janitor().track(speech_file_path)
+
+                        st.success("The audio file has been created successfully.")
+                        st.caption(f"Re-used {synthesis_stats['reused']} of {synthesis_stats['segments']} sentences, "
+                                   f"{synthesis_stats['chars_synthesized']} characters synthesized")
+
+                        if get_media_server() is not None:
+                            # The download and the player are both served from the file on disk, the session keeps no copy
+                            st.link_button("Download Speech File", file_url(speech_file_path, download=True))
+                            audio_source = file_url(speech_file_path)
+                        else:
+                            # Read the saved audio file once, the same bytes back the download button and the player
+                            audio_source = speech_file_path.read_bytes()
+                            st.download_button(
+                                label="Download Speech File",
+                                data=audio_source,
+                                file_name=speech_file_path.name,
+                                mime=output_format.mime
+                            )
+
+                        # Display an audio player option to listen to the generated speech
+                        st.audio(audio_source, format=output_format.mime, start_time=0)
+                        # Without streaming the audio can only be played once the whole file is ready
+                        st.caption(f"Time to first audio: {(time.time() - synthesis_started) * 1000:.0f} ms")
 
                 except Exception as e:
                     st.error(f"An error occurred during audio generation: {str(e)}")
@@ -120,7 +191,7 @@ if 'elevenlabs_api_key' in st.session_state and st.session_state['elevenlabs_api
             # Handle exceptions that may occur during the API calls to fetch voices
             st.error(f"Error fetching voices. Please check your API key: {e}")
             # Clear the invalid API key from session state
-            st.session_state.pop('elevenlabs_api_key', None)
+            get_tenants().discard(st.session_state.pop('elevenlabs_api_key'))
             st.sidebar.error("API key validation failed. Please enter a valid key.")
     
     except ImportError as e:
@@ -141,22 +212,3 @@ footer = """
     </div>
 """
 st.markdown(footer, unsafe_allow_html=True)
-
-# Function to clean up old audio files
-def cleanup_files(directory, max_age=600):
-    """
-    Remove files in the specified directory that are older than max_age seconds.
-    """
-    if not os.path.exists(directory):
-        return  # Exit if the directory doesn't exist
-    for filename in os.listdir(directory):
-        file_path = Path(directory) / filename
-        if file_path.is_file() and file_path.stat().st_mtime < time.time() - max_age:
-            try:
-                file_path.unlink()
-                print(f"Deleted old file: {file_path}")
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-
-# Call this function at the end of your Streamlit script to clean up old audio files
-cleanup_files('./audio-outputs/', max_age=600)
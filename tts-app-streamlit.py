@@ -7,9 +7,34 @@ import time
 import warnings
 from dotenv import load_dotenv
 from datetime import datetime
-from elevenlabs.client import ElevenLabs
+from functools import partial
+from tts_client import connection_stats, get_client
+from tts_cache import get_cache
+from tts_pipeline import synthesize_incremental
+from tts_audio import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, PLAYABLE_FORMATS, finalizer_for
+from voice_catalog import get_catalog
+from tts_stream import file_url, get_media_server, get_stream, stream_url
+from tts_storage import new_output_path
+from tts_jobs import get_job_queue
+from tts_metrics import get_metrics_server
+from tts_janitor import get_janitor
+from tts_previews import PREVIEWS_ENABLED, get_previews
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pydantic as pydantic
+# Seconds between two progress updates of running jobs
+JOB_POLL_INTERVAL = 1.0
+# Jobs listed per session (and kept in the URL), older ones are dropped from the page
+MAX_SESSION_JOBS = int(os.getenv('TTS_SESSION_MAX_JOBS', 5))
+
+
+# Finished audio files are read once and kept for the polls and reruns of all sessions (a new file
+# name is used for every job, so an entry never gets outdated)
+@st.cache_resource(max_entries=16, ttl=3600, show_spinner=False)
+def read_audio(file_path):
+    return file_path.read_bytes()
+
+
 # Suppress DeprecationWarning
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 # To handle warnings related to no supported SSL module
@@ -36,100 +61,158 @@ st.set_page_config(
 )
 # Load environment variables from .env file
 load_dotenv()
+# Expose the Prometheus-style synthesis metrics next to the Streamlit server (started once per process)
+get_metrics_server()
+# Expired audio files are removed by a background thread instead of a sweep on every rerun
+get_janitor()
 # Get the current date and time for filename uniqueness
 now = datetime.now()
 date_string = now.strftime("%Y-%m-%d_%H-%M")
-# Create an instance of the ElevenLabs client with the API key
+# Get the process-wide ElevenLabs client for the API key, it is shared by all sessions and reuses
+# pooled keep-alive connections instead of opening new ones on every rerun
 elevenlabs_api_key = os.getenv('ELEVEN_API_KEY')
-client = ElevenLabs(api_key=elevenlabs_api_key)
+client = get_client()
 # Initialize an empty list to hold the voice names for Streamlit dropdown menu options
 voice_names = []
-# List all available Elevenlabs voices and print their details.
-#supported_voices = client.voices.get_all()
+# List all available Elevenlabs voices from the process-wide catalog (shared by all sessions and
+# refreshed in the background, so reruns do not call the API)
+voice_catalog = get_catalog(client, api_key=elevenlabs_api_key)
 try:
-    supported_voices = client.voices.get_all()
-except pydantic.ValidationError as e:
+    voice_names = voice_catalog.names()
+except Exception as e:
     st.error("Failed to fetch voices. Please check the API key and try again.")
-    supported_voices = None
-if supported_voices is not None:
-    if hasattr(supported_voices, 'voices'):
-        for voice in supported_voices.voices:  # Accessing the voices attribute directly
-            gender = voice.labels.get('gender', 'Unknown')
-            voice_names.append(voice.name)
-    else:
-        st.error("No voices available. Please check your API response.")
-else:
+if not voice_names:
     st.error("No voices available. Please check your API response.")
-# print("\n")
-# print("***************************************************")
-# print("Available Elevenlabs voices:")
-# print("***************************************************")
-print("\n")
-#print(supported_voices) # Print the entire raw response
-# Iterate over each voice in the response and print the required details.
-if supported_voices and hasattr(supported_voices, 'voices'):
-    for voice in supported_voices.voices:
-        gender = voice.labels.get('gender', 'Unknown')
-        voice_names.append(voice.name)
-        #print(f"Voice ID: {voice.voice_id}, Name: {voice.name}, Category: {voice.category},Gender: {gender}")
-print("\n")
 # End of the script which list all available Elevenlabs voices
 # Streamlit app interface
 st.title('Text to Speech Generator using ElevenLabs API')
+# Connection reuse statistics of the shared HTTP connection pool
+http_stats = connection_stats()
+st.sidebar.caption(f"HTTP requests: {http_stats['requests']}, new connections: {http_stats['new_connections']}, "
+                   f"reused: {http_stats['reuse_ratio']:.0%} (pool size {http_stats['pool_size']}, "
+                   f"HTTP/2 {'on' if http_stats['http2'] else 'off'})")
 # Dropdown menu for voice selection
 selected_voice = st.selectbox("Choose a voice for speech generation:", voice_names)
+# Short preview of the selected voice, the previews of all voices are rendered once in the background
+# (only new or changed voices are rendered again when the catalog is refreshed)
+if PREVIEWS_ENABLED and voice_names:
+    voice_previews = get_previews()
+    voice_previews.sync(client, voice_catalog.voices())
+    preview_path = voice_previews.get(voice_catalog.get(selected_voice))
+    if preview_path is not None and preview_path.exists():
+        st.audio(preview_path.read_bytes(), format='audio/mpeg')
+    else:
+        st.caption("The preview of this voice is being prepared.")
 # Text area for user input
 user_input_text = st.text_area("Enter the text you want to convert to speech:", height=150)
+# Output format and bitrate of the generated file, PCM based formats can be cleaned up after synthesis
+output_format = OUTPUT_FORMATS[st.selectbox("Audio format:", PLAYABLE_FORMATS,
+                                            index=PLAYABLE_FORMATS.index(DEFAULT_OUTPUT_FORMAT)
+                                            if DEFAULT_OUTPUT_FORMAT in PLAYABLE_FORMATS else 0,
+                                            format_func=lambda name: OUTPUT_FORMATS[name].label)]
+postprocess = st.checkbox("Clean up the audio (trim silence, normalize loudness)",
+                          disabled=output_format.codec != 'pcm', help="Available for the WAV formats")
 ##########################################
 # *** Beginning of Audio synthesis script 
 ##########################################
+# Streaming playback starts the audio player as soon as the first chunks arrive (needs the local media server)
+media_server = get_media_server()
+stream_playback = st.toggle("Stream playback while the speech is generated", value=media_server is not None,
+                            disabled=media_server is None)
+# Jobs of this session are kept in the URL, so they are found again after reruns and page reloads
+job_queue = get_job_queue()
+session_jobs = [job for job in map(job_queue.get, st.query_params.get_all('job')) if job is not None][:MAX_SESSION_JOBS]
 # Submit button to convert the text to speech
 submit = st.button('Convert to Speech')
 if submit:
     if user_input_text:
-        # Process the conversion
+        # Queue the conversion, it runs on the process-wide worker pool so this script never waits for the API
         try:
-            # Get the current date and time
-            now = datetime.now()
-            # Format the date and time as a string
-            date_string = now.strftime("%Y-%m-%d_%H-%M")
-            speech_file_path = Path("audio-outputs") / f"speech-{date_string}.mp3"
-            # Create directory if it doesn't exist
-            speech_file_directory = Path(__file__).parent / "audio-outputs"
-            speech_file_path.parent.mkdir(parents=True, exist_ok=True)
-            # Define the path to the audio file, parameters for the speech model, and the manually typed input text for conversion to audio file
-            speech_file_path = speech_file_directory / f"speech-{date_string}.mp3"
-            # Generate the speech audio using Elevenlabs API from the provided text
-            response = client.generate(
+            session_id = get_script_run_ctx().session_id
+            # Every job gets its own file, so sessions converting at the same time never overwrite each other
+            speech_file_path = new_output_path(extension=output_format.extension)
+            # Generate the speech audio using Elevenlabs API from the provided text; sentences synthesized
+            # before (e.g. when the text was only edited) are served from the local cache
+            synthesis_stats = {}
+            produce = partial(
+                synthesize_incremental,
+                client,
                 text=user_input_text,
-                voice=selected_voice,
-                model="eleven_multilingual_v2"
+                voice=voice_catalog.resolve(selected_voice),
+                cache=get_cache(),
+                # Requests of concurrent sessions are queued fairly by the scheduler
+                session_id=session_id,
+                stats=synthesis_stats,
+                output_format=output_format.name,
+                postprocess=postprocess and output_format.codec == 'pcm'
             )
-            # Save the response to a file
-            with open(speech_file_path, 'wb') as out_file:
-                for chunk in response:
-                    out_file.write(chunk)
-            # Display a message to inform the user that the file was created
-            st.success("The audio file has been created successfully.")
-            # Read the saved audio file in binary mode
-            with open(speech_file_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
-            
-            # Provide a link for the user to download the MP3 file
-            st.download_button(label="Download Speech File",
-                            data=audio_data,
-                            file_name=speech_file_path.name,
-                            mime="audio/mp3")
-            
-            # Display an audio player option to listen to the generated speech (Chrome browser supported)
-            st.write("Listen to the generated speech using below built-in audio player:")
-            st.audio(audio_data, format='audio/mp3', start_time=0)
+            job = job_queue.submit(produce, file_path=speech_file_path, owner=session_id,
+                                   label=f"{selected_voice} ({output_format.label})", stats=synthesis_stats,
+                                   mime=output_format.mime, finalize=finalizer_for(output_format))
+            session_jobs = [job] + session_jobs[:MAX_SESSION_JOBS - 1]
+            st.query_params['job'] = [session_job.job_id for session_job in session_jobs]
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")
     else:
         st.error("Please enter some text to convert to speech.")
-else:
+elif not session_jobs:
     st.info("INSTRUCTIONS: Select from supported voice, Enter text, and click the Convert button to create an audio file.")
+
+# Progress and results of the jobs of this session, newest first
+for job in session_jobs:
+    progress = job.progress()
+    st.subheader(f"{job.label} - {datetime.fromtimestamp(job.created_at).strftime('%H:%M:%S')}")
+    serve_files = media_server is not None
+    audio_bytes = None
+    expired = job.status == "done" and not job.file_path.exists()
+    if job.status == "done" and not expired and not serve_files:
+        try:
+            # Read once per file and shared by the reruns and polls of all sessions
+            audio_bytes = read_audio(job.file_path)
+        except FileNotFoundError:
+            expired = True
+    # One status line per job, so the player below it keeps its position while the job moves on
+    if job.status == "queued":
+        st.info(f"Waiting in the queue, position {job_queue.position(job)}.")
+    elif job.status == "running":
+        st.info(f"Generating the speech: {progress['chunks']} chunks, {progress['bytes'] / 1024:.0f} KB received.")
+    elif job.status == "failed":
+        st.error(f"An error occurred: {str(job.error)}")
+    elif expired:
+        # Removed by the janitor or by the cleanup of the CLI once it was no longer held
+        st.warning("This audio file has expired, please convert the text again.")
+    else:
+        # Display a message to inform the user that the file was created
+        st.success("The audio file has been created successfully.")
+    if job.status in ("queued", "failed") or expired:
+        continue
+
+    # A player started from the stream stays the same element when the job completes (the stream is
+    # replayable from the file), so the playback is not interrupted by the next poll
+    streamed = stream_playback and progress['time_to_first_chunk'] is not None and get_stream(job.stream_id) is not None
+    if streamed:
+        st.audio(stream_url(job.stream_id), format=job.buffer.mime, start_time=0)
+    elif job.status == "done":
+        # With file links the player is served from the file on disk and the session keeps no copy
+        st.audio(file_url(job.file_path) if serve_files else audio_bytes, format=job.buffer.mime, start_time=0)
+
+    if job.status == "running":
+        if streamed:
+            st.caption(f"Time to first audio: {progress['time_to_first_chunk'] * 1000:.0f} ms")
+        continue
+    cache_stats = get_cache().stats()
+    st.caption(f"Synthesis cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+               f"re-used {job.stats.get('reused', 0)} of {job.stats.get('segments', 0)} sentences, "
+               f"{job.stats.get('chars_synthesized', 0)} characters synthesized, "
+               f"generated in {job.finished_at - job.started_at:.1f} s")
+    if serve_files:
+        st.link_button("Download Speech File", file_url(job.file_path, download=True))
+    else:
+        st.download_button(label="Download Speech File",
+                           data=audio_bytes,
+                           file_name=job.file_path.name,
+                           mime=job.buffer.mime,
+                           key=f"download-{job.job_id}")
 ##########################################
 # *** End of Audio synthesis script 
 ##########################################
@@ -143,23 +226,7 @@ footer = """
     </div>
 """
 st.markdown(footer, unsafe_allow_html=True)
-# Function to clean up old audio files
-def cleanup_files(directory, max_age=600):
-    """
-    Remove files in the specified directory that are older than max_age seconds.
-    """
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        # Check if the file is an actual file
-        if os.path.isfile(file_path):
-            # Check the file's modification time
-            if os.stat(file_path).st_mtime < time.time() - max_age:
-                try:
-                    os.remove(file_path)
-                    print("***************************************************")
-                    print(f"*** Deleted following old generated speech files --> {file_path}")
-                except Exception as e:
-                    print(f"Error while deleting file {file_path}: {e}")
-# You can call this function at the end of your Streamlit script
-# to clean up the audio files periodically (e.g., files older than 10 minutes)
-cleanup_files('./audio-outputs/', max_age=600)
\ No newline at end of file
+# Poll the jobs of this session until all of them are finished
+if any(job.active for job in session_jobs):
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
@@ -1,19 +1,22 @@
 # Description: This is a simple Python script that uses the ElevenLABS API to convert text to speech and save the audio file to disk.
 
 # Import the required libraries
+# Only lightweight modules are imported up front. The ElevenLabs SDK and the synthesis pipeline are
+# imported where they are needed, so --help, argument errors and the voice selection return quickly.
 from pathlib import Path
-import requests
+import argparse
 import os
+import re
+import sys
 import time
 import warnings
 from dotenv import load_dotenv
-from datetime import datetime
-from elevenlabs.client import ElevenLabs
+from tts_audio import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, finalizer_for, get_output_format
+from tts_storage import OUTPUT_DIR, new_output_path
+from voice_catalog import DEFAULT_SNAPSHOT_PATH, VoiceCatalog, key_fingerprint
 
-# To handle warnings related to no supported SSL module
-import warnings
-from urllib3.exceptions import NotOpenSSLWarning
-warnings.filterwarnings("ignore", category=NotOpenSSLWarning)
+# To handle warnings related to no supported SSL module (matched by message, so urllib3 is not imported just to silence it)
+warnings.filterwarnings("ignore", message="urllib3 v2 only supports OpenSSL")
 
 # Suppress specific warnings - if ignoring of warning messages is enabled, script stops working. if disabled, warning messages appear, but script is running correctly.
 #from pydantic._internal._config import UserWarning as PydanticUserWarning
@@ -25,118 +28,214 @@ warnings.filterwarnings("ignore", category=NotOpenSSLWarning)
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the current date and time for filename uniqueness
-now = datetime.now()
-date_string = now.strftime("%Y-%m-%d_%H-%M")
-
 # Suppress DeprecationWarning
-import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Create an instance of the ElevenLabs client with the API key
+# API key of the ElevenLabs account, the client itself is only created once it is needed
 elevenlabs_api_key = os.getenv('ELEVEN_API_KEY')
-client = ElevenLabs(api_key=elevenlabs_api_key)
 
 # Define the path to the text file
 text_file_path = Path(__file__).parent / "text-for-conversion.txt"
 
+# Voice IDs are 20 alphanumeric characters, anything else is treated as a voice name
+VOICE_ID_RE = re.compile(r'^[a-zA-Z0-9]{20}$')
+
+# Command line options - without any options the script runs interactively as before
+parser = argparse.ArgumentParser(description="Convert text to speech using the ElevenLabs API.")
+parser.add_argument('text', nargs='*',
+                    help="text to convert (default: text-for-conversion.txt, or stdin when --voice is given and stdin is piped)")
+parser.add_argument('-i', '--input', metavar='PATH', help="read the text from a file, '-' reads stdin")
+parser.add_argument('-o', '--output', metavar='PATH', help="audio file to write (default: a new file in audio-outputs/)")
+parser.add_argument('--voice', help="voice name or ID, skips the interactive voice selection "
+                                    "(in batch mode: the voice of jobs without one)")
+parser.add_argument('--list-voices', action='store_true', help="print the available voices and exit")
+parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default=DEFAULT_OUTPUT_FORMAT,
+                    help=f"audio format and bitrate of the output file (default: {DEFAULT_OUTPUT_FORMAT}; "
+                         "in batch mode: the format of jobs without one)")
+parser.add_argument('--postprocess', action='store_true',
+                    help="trim silence and normalize the loudness (WAV and PCM formats only; "
+                         "in batch mode: of the jobs with such a format)")
+parser.add_argument('--batch', metavar='PATH',
+                    help="run non-interactively over a directory of .txt files or a JSONL manifest")
+parser.add_argument('--workers', type=int,
+                    help="number of batch jobs rendered in parallel (default: TTS_BATCH_WORKERS or 4)")
+parser.add_argument('--output-dir', default=str(Path(__file__).parent / "audio-outputs" / "batch"),
+                    help="directory for the rendered batch files")
+parser.add_argument('--results', help="results manifest (JSONL), defaults to results.jsonl in the output directory")
+args = parser.parse_args()
+output_format = get_output_format(args.format)
+# Batch jobs can select their own format, there --postprocess applies to the jobs with a PCM based one
+if args.postprocess and output_format.codec != 'pcm' and not args.batch:
+    parser.error("--postprocess needs a WAV or PCM --format")
+
+
+def fetch_voices():
+    # Only called when the local voice snapshot is missing, stale or does not know a voice
+    from tts_client import get_client
+    return get_client().voices.get_all()
+
+
+# Voices are served from the on-disk snapshot shared with the Streamlit app, without a network round-trip.
+# A stale snapshot is fine for a single run: no background refresh, an unknown voice triggers refresh()
+voice_catalog = VoiceCatalog(
+    fetch=fetch_voices,
+    ttl=None,
+    snapshot_path=DEFAULT_SNAPSHOT_PATH,
+    snapshot_tag=key_fingerprint(elevenlabs_api_key),
+)
+
+
+def resolve_voice(name_or_id):
+    """
+    Return the voice ID for a voice name or ID; the API is only asked when the name is not known locally.
+    """
+    if VOICE_ID_RE.match(name_or_id):
+        return name_or_id
+    voice = voice_catalog.get(name_or_id) or find_voice(name_or_id)
+    if voice is None:
+        # The voice may have been added after the snapshot was taken
+        voice_catalog.refresh()
+        voice = voice_catalog.get(name_or_id) or find_voice(name_or_id)
+    if voice is None:
+        print(f"Unknown voice: {name_or_id}. Run the script with --list-voices to see the available voices.")
+        sys.exit(2)
+    return voice.voice_id
+
+
+def find_voice(name):
+    # Case-insensitive match, so "--voice rachel" finds "Rachel"
+    for voice in voice_catalog.voices():
+        if voice.name.lower() == name.lower():
+            return voice
+    return None
+
+
+def read_input_text():
+    """
+    Return the text to convert from the arguments, a file, stdin or the default text file.
+    """
+    if args.text:
+        return " ".join(args.text)
+    if args.input == '-':
+        return sys.stdin.read()
+    if args.input:
+        return Path(args.input).read_text()
+    if args.voice and not sys.stdin.isatty():
+        piped_text = sys.stdin.read()
+        if piped_text.strip():
+            return piped_text
+    with open(text_file_path, 'r') as in_file:
+        return in_file.read()
 
 
+##########################################
+# *** Batch mode
+##########################################
 
-# List all available Elevenlabs voices and print their details.
-#supported_voices = client.voices.get_all()
+if args.batch:
+    from tts_batch import DEFAULT_BATCH_WORKERS, BatchRunner, load_jobs
+    from tts_cache import get_cache
+    from tts_client import get_client
+
+    runner = BatchRunner(
+        get_client(),
+        output_dir=args.output_dir,
+        results_path=args.results or Path(args.output_dir) / "results.jsonl",
+        workers=args.workers or DEFAULT_BATCH_WORKERS,
+        cache=get_cache(),
+        resolve_voice=voice_catalog.resolve,
+    )
+    # Jobs recorded as done in the results manifest are skipped, so an interrupted batch can simply be restarted
+    summary = runner.run(load_jobs(args.batch, default_voice=args.voice, default_format=output_format.name,
+                                   postprocess=args.postprocess))
+    print("\n")
+    print("***************************************************")
+    print(f" Batch finished: {summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped")
+    print(f" Results manifest --> {runner.results_path}")
+    print("***************************************************")
+    sys.exit(1 if summary['failed'] else 0)
 
-try:
-    supported_voices = client.voices.get_all()
-except pydantic.ValidationError as e:
-    print("Failed to parse response: ", e)
-    supported_voices = None
-
-if supported_voices is not None:
-    voice_names = []
-    for voice in supported_voices.voices:  # Accessing the voices attribute directly
+##########################################
+# *** Voice selection
+##########################################
+
+if args.list_voices or not args.voice:
+    # List all available Elevenlabs voices and print their details (once, numbered for the selection below)
+    try:
+        supported_voices = voice_catalog.voices()
+    except Exception as e:
+        print(f"Failed to fetch voices: {e}")
+        sys.exit(1)
+    if not supported_voices:
+        print("No voices found, please check the API key.")
+        sys.exit(1)
+    for index, voice in enumerate(supported_voices, start=1):
         gender = voice.labels.get('gender', 'Unknown')
-        voice_names.append(voice.name)
-        print(f"Voice ID: {voice.voice_id}, Name: {voice.name}, Category: {voice.category}, Gender: {gender}")
-    
-    if not voice_names:
-        print("No voices found, please check the API response structure.")
+        print(f"{index}: {voice.name} (Voice ID: {voice.voice_id}, Category: {voice.category}, Gender: {gender})")
+    print("\n")
+    if args.list_voices:
+        sys.exit(0)
+
+    # Ask the user to select a voice for generating the speech audio
+    user_choice = input("Please choose a voice by typing the number next to it: ")
+
+    # Validate the user's choice
+    try:
+        choice_index = int(user_choice) - 1  # Convert to zero-based index
+        if choice_index < 0 or choice_index >= len(supported_voices):
+            raise ValueError("Choice out of range")
+    except ValueError as e:
+        print("Invalid choice, please run the script again and select a valid number.")
+        exit()
+
+    # Retrieve the selected voice
+    selected_voice = supported_voices[choice_index]
+    selected_voice_id = selected_voice.voice_id
+    print("\n")
+    print("*****************************************************")
+    print(f"You have selected the following voice: {selected_voice.name}")
+    print("*****************************************************")
+    print("\n")
 else:
-    print("No valid voices data retrieved.")
-
-# print("\n")
-# print("***************************************************")
-# print("Available Elevenlabs voices:")
-# print("***************************************************")
-# print("\n")
-#print(supported_voices) # Print the entire raw response
-
-# Iterate over each voice in the response and print the required details.
-for voice in supported_voices.voices:
-    gender = voice.labels.get('gender', 'Unknown')
-    voice_names.append(voice.name)
-    #print(f"Voice ID: {voice.voice_id}, Name: {voice.name}, Category: {voice.category},Gender: {gender}")
-print("\n")
-
-# End of the script which list all available Elevenlabs voices
-
-# Assuming voice_names is already populated with the names of available voices
-for index, name in enumerate(voice_names, start=1):
-    print(f"{index}: {name}")
-
-# Ask the user to select a voice for generating the speech audio
-user_choice = input("Please choose a voice by typing the number next to it: ")
-
-# Validate the user's choice
-try:
-    choice_index = int(user_choice) - 1  # Convert to zero-based index
-    if choice_index < 0 or choice_index >= len(voice_names):
-        raise ValueError("Choice out of range")
-except ValueError as e:
-    print("Invalid choice, please run the script again and select a valid number.")
-    exit()
-
-# Retrieve the selected voice name
-selected_voice_name = voice_names[choice_index]
-print("\n")
-print("*****************************************************")
-print(f"You have selected the following voice: {selected_voice_name}")
-print("*****************************************************")
-print("\n")
+    # Fast path for scripted use: the voice is resolved locally and nothing is printed or asked
+    selected_voice_id = resolve_voice(args.voice)
 
 ##########################################
 # *** Beginning of Audio synthesis script 
 ##########################################
 
-# Open the text file and read its content
-with open(text_file_path, 'r') as in_file:
-    input_text = in_file.read()
+# Read the text to convert
+input_text = read_input_text()
 
+# Define the path to the audio file, every run gets its own file unless --output is given
+speech_file_path = Path(args.output) if args.output else new_output_path(extension=output_format.extension)
+
+# Generate the speech audio using Elevenlabs API from the provided text and save it to the file.
+# Long texts are split at sentence/paragraph boundaries and the segments are synthesized in parallel,
+# repeated requests (and already synthesized segments) are served from the local cache.
+# Throttled or failed API requests are retried with backoff by the scheduler before giving up.
+# The synthesis pipeline (and with it the ElevenLabs SDK) is only imported now, after all input is known.
+from tts_cache import get_cache
+from tts_client import get_client
+from tts_pipeline import synthesize_long_text
+from tts_storage import write_atomic
 
-# Generate the speech audio using Elevenlabs API from the provided text
 try:
-    response = client.generate(
+    response = synthesize_long_text(
+      get_client(),
       text=input_text,
-      voice=selected_voice_name,
-      model="eleven_multilingual_v2"
+      voice=selected_voice_id,
+      cache=get_cache(),
+      output_format=output_format.name,
+      postprocess=args.postprocess
     )
+    # The file is written under a temporary name and only renamed once complete,
+    # so a failed run does not leave a truncated audio file behind (WAV headers are completed before the rename)
+    write_atomic(speech_file_path, response, finalize=finalizer_for(output_format))
 except Exception as e:
     print(f"An error occurred: {e}")
-    # Handle the error or exit
-
-# Define the path to save the audio file, ensuring the directory exists
-# 1. Check if the directory for the audio file exists, and create it if it doesn't
-speech_file_directory = Path(__file__).parent / "audio-outputs"
-speech_file_directory.parent.mkdir(parents=True, exist_ok=True)
-
-# Define the path to the audio file, parameters for the speech model, and the manually typed input text for conversion to audio file
-speech_file_path = speech_file_directory / f"speech-{date_string}.mp3"
+    sys.exit(1)
 
-# Save the response to a file
-with open(speech_file_path, 'wb') as out_file:
-    for chunk in response:
-        out_file.write(chunk)
-        
 print("\n")
 print("***************************************************")
 print(f" Generated Audio file saved to --> {speech_file_path}")
@@ -150,9 +249,14 @@ print("\n")
 # Function to clean up old audio files
 def cleanup_files(directory, max_age=600):
     """
-    Remove files in the specified directory that are older than max_age seconds.
+    Remove generated speech files in the specified directory that are older than max_age seconds.
     """
+    if not os.path.isdir(directory):
+        return
     for filename in os.listdir(directory):
+        # Only files written by new_output_path() are removed, anything else in the directory is left alone
+        if not filename.startswith("speech-"):
+            continue
         file_path = os.path.join(directory, filename)
         # Check if the file is an actual file
         if os.path.isfile(file_path):
@@ -167,6 +271,6 @@ def cleanup_files(directory, max_age=600):
 
 # You can call this function at the end of your Streamlit script
 # to clean up the audio files periodically (e.g., files older than 10 minutes)
-cleanup_files('./audio-outputs/', max_age=600)
+cleanup_files(OUTPUT_DIR, max_age=600)
 
 
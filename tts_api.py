@@ -0,0 +1,234 @@
+# Description: Headless HTTP synthesis API (Tornado) - streams the audio back with chunked transfer encoding as it arrives.
+
+# Import the required libraries
+import asyncio
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+from tornado.iostream import StreamClosedError
+
+from tts_audio import DEFAULT_OUTPUT_FORMAT, get_output_format
+from tts_cache import get_cache
+from tts_client import get_client
+from tts_metrics import get_metrics_server
+from tts_pipeline import synthesize_long_text
+from tts_synthesis import DEFAULT_MODEL
+from voice_catalog import get_catalog
+
+# Address of the API and its limits, can be overridden via environment variables
+API_HOST = os.getenv('TTS_API_HOST', '127.0.0.1')
+API_PORT = int(os.getenv('TTS_API_PORT', 8600))
+# Threads for the short blocking calls of the handlers (voice lookups); the event loop itself never blocks
+API_WORKERS = int(os.getenv('TTS_API_WORKERS', 64))
+# Chunks a stream reads ahead of a slow caller
+READ_AHEAD = int(os.getenv('TTS_API_READ_AHEAD', 16))
+API_MAX_CHARS = int(os.getenv('TTS_API_MAX_CHARS', 100000))
+# When set, requests need an "Authorization: Bearer <token>" header
+API_TOKEN = os.getenv('TTS_API_TOKEN') or None
+
+# Queued by the reader thread once a stream is exhausted
+_END = object()
+
+
+class StreamReader:
+    """
+    Reads the audio chunks of one response on a thread of its own and hands them to the event loop.
+
+    Waiting for a scheduler slot blocks only the thread of this stream. A shared pool would deadlock
+    once all its threads wait for a slot while the streams holding the slots need a thread for
+    their next chunk. At most max_chunks are read ahead of the caller.
+    """
+
+    def __init__(self, chunks, max_chunks=READ_AHEAD):
+        self.chunks = chunks
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize=max_chunks)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, name="tts-api-stream", daemon=True)
+        self.thread.start()
+
+    async def next(self):
+        """
+        Return the next chunk, or _END once the stream is complete; re-raises the error of the synthesis.
+        """
+        item = await self.queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        """
+        Stop reading; the generators are closed by the reader thread once its current read returns.
+        """
+        self.stopped.set()
+        # Unblock a reader waiting for room in the queue
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def _put(self, item):
+        if not self.stopped.is_set():
+            asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def _read(self):
+        try:
+            for chunk in self.chunks:
+                if self.stopped.is_set():
+                    break
+                self._put(chunk)
+            self._put(_END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            # Runs the cleanup of the generators: segments not started yet are cancelled, so a caller that went
+            # away stops the API requests, and a shared request is handed off to its followers
+            self.chunks.close()
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    """
+    Common behaviour of the API endpoints: optional bearer token and JSON errors.
+    """
+
+    def prepare(self):
+        if API_TOKEN is None:
+            return
+        header = self.request.headers.get('Authorization', "")
+        if not hmac.compare_digest(header.encode('utf-8'), f"Bearer {API_TOKEN}".encode('utf-8')):
+            raise tornado.web.HTTPError(401, "Missing or invalid API token")
+
+    def write_error(self, status_code, **kwargs):
+        # The message of an HTTPError goes into the body, the status line keeps the standard reason
+        error = kwargs.get('exc_info', (None, None))[1]
+        message = error.log_message if isinstance(error, tornado.web.HTTPError) and error.log_message else self._reason
+        self.set_header('Content-Type', "application/json")
+        self.finish(json.dumps({'error': message, 'status': status_code}))
+
+
+class HealthHandler(BaseHandler):
+
+    def prepare(self):
+        # Health checks do not need the token
+        pass
+
+    def get(self):
+        self.write({'status': "ok"})
+
+
+class VoicesHandler(BaseHandler):
+    """
+    GET /v1/voices - the voices of the configured API key, served from the shared voice catalog.
+    """
+
+    async def get(self):
+        catalog = self.application.settings['catalog']
+        # Only the very first request (or a missing snapshot) waits for the API, and not on the event loop
+        voices = await tornado.ioloop.IOLoop.current().run_in_executor(
+            self.application.settings['executor'], catalog.voices)
+        self.write({'voices': [voice._asdict() for voice in voices]})
+
+
+class SynthesizeHandler(BaseHandler):
+    """
+    POST /v1/synthesize with a JSON body {"text": ..., "voice": name or ID, "model": ..., "format": ...,
+    "postprocess": false} - streams the audio back while it is being generated.
+    """
+
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, "The request body must be JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, "The request body must be a JSON object")
+        text = body.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise tornado.web.HTTPError(400, "'text' is required")
+        if len(text) > API_MAX_CHARS:
+            raise tornado.web.HTTPError(413, f"'text' is longer than {API_MAX_CHARS} characters")
+        if not body.get('voice'):
+            raise tornado.web.HTTPError(400, "'voice' is required")
+        try:
+            audio_format = get_output_format(body.get('format') or DEFAULT_OUTPUT_FORMAT)
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, str(e))
+        postprocess = bool(body.get('postprocess')) and audio_format.codec == 'pcm'
+
+        executor = self.application.settings['executor']
+        loop = tornado.ioloop.IOLoop.current()
+        voice = await loop.run_in_executor(executor, self.application.settings['catalog'].resolve, body['voice'])
+        reader = StreamReader(synthesize_long_text(
+            self.application.settings['client'],
+            text=text,
+            voice=voice,
+            model=body.get('model') or DEFAULT_MODEL,
+            cache=self.application.settings['cache'],
+            # Requests of the same caller are queued fairly against the others by the scheduler
+            session_id=self.request.headers.get('X-Client-Id') or self.request.remote_ip,
+            output_format=audio_format.name,
+            postprocess=postprocess,
+        ))
+
+        try:
+            # Errors before the first chunk can still be reported with a proper status code
+            try:
+                chunk = await reader.next()
+            except Exception as e:
+                print(f"Error while synthesizing for the API: {e}")
+                raise tornado.web.HTTPError(502, f"Synthesis failed: {e}")
+
+            # Without a Content-Length Tornado sends the body with chunked transfer encoding
+            self.set_header('Content-Type', audio_format.mime)
+            self.set_header('Cache-Control', "no-store")
+            while chunk is not _END:
+                self.write(chunk)
+                try:
+                    await self.flush()
+                except StreamClosedError:
+                    # The caller went away, stop reading from the API
+                    return
+                try:
+                    chunk = await reader.next()
+                except Exception as e:
+                    # The status line is already sent, a cut-off chunked response tells the caller it failed
+                    print(f"Error while streaming synthesis for the API: {e}")
+                    self.request.connection.close()
+                    return
+            self.finish()
+        finally:
+            reader.close()
+
+
+def make_app(client=None, catalog=None, cache=None, workers=API_WORKERS):
+    """
+    Create the Tornado application; by default it uses the process-wide client, voice catalog and cache.
+    """
+    client = client or get_client()
+    return tornado.web.Application(
+        [
+            (r"/healthz", HealthHandler),
+            (r"/v1/voices", VoicesHandler),
+            (r"/v1/synthesize", SynthesizeHandler),
+        ],
+        client=client,
+        catalog=catalog or get_catalog(client, api_key=os.getenv('ELEVEN_API_KEY')),
+        cache=cache if cache is not None else get_cache(),
+        executor=ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-api"),
+    )
+
+
+def serve(host=API_HOST, port=API_PORT):
+    """
+    Start the API server and run the event loop until interrupted.
+    """
+    # Expose the synthesis metrics next to the API, as the Streamlit apps do
+    get_metrics_server()
+    server = tornado.httpserver.HTTPServer(make_app())
+    server.listen(port, address=host)
+    print(f"*** Text-2-Speech API listening on http://{host}:{port}")
+    tornado.ioloop.IOLoop.current().start()
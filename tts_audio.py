@@ -0,0 +1,84 @@
+# Description: Selectable output formats (MP3 bitrates, WAV, raw PCM) and the WAV container.
+
+# Import the required libraries
+import os
+import struct
+from collections import OrderedDict, namedtuple
+
+# Description of a selectable output format. api_format is the format requested from the ElevenLabs API,
+# container tells how the audio is packaged on disk ("mp3", "wav" or "raw" 16-bit little-endian mono PCM)
+OutputFormat = namedtuple('OutputFormat', ['name', 'label', 'api_format', 'codec', 'container', 'sample_rate',
+                                           'extension', 'mime'])
+
+OUTPUT_FORMATS = OrderedDict((audio_format.name, audio_format) for audio_format in [
+    OutputFormat('mp3_44100_128', "MP3 128 kbps", 'mp3_44100_128', 'mp3', 'mp3', 44100, 'mp3', 'audio/mpeg'),
+    OutputFormat('mp3_44100_192', "MP3 192 kbps (Creator tier)", 'mp3_44100_192', 'mp3', 'mp3', 44100, 'mp3',
+                 'audio/mpeg'),
+    OutputFormat('mp3_44100_96', "MP3 96 kbps", 'mp3_44100_96', 'mp3', 'mp3', 44100, 'mp3', 'audio/mpeg'),
+    OutputFormat('mp3_44100_64', "MP3 64 kbps (mobile)", 'mp3_44100_64', 'mp3', 'mp3', 44100, 'mp3', 'audio/mpeg'),
+    OutputFormat('mp3_44100_32', "MP3 32 kbps", 'mp3_44100_32', 'mp3', 'mp3', 44100, 'mp3', 'audio/mpeg'),
+    OutputFormat('mp3_22050_32', "MP3 32 kbps, 22 kHz (smallest)", 'mp3_22050_32', 'mp3', 'mp3', 22050, 'mp3',
+                 'audio/mpeg'),
+    OutputFormat('wav_16000', "WAV 16 kHz", 'pcm_16000', 'pcm', 'wav', 16000, 'wav', 'audio/wav'),
+    OutputFormat('wav_22050', "WAV 22.05 kHz", 'pcm_22050', 'pcm', 'wav', 22050, 'wav', 'audio/wav'),
+    OutputFormat('wav_24000', "WAV 24 kHz", 'pcm_24000', 'pcm', 'wav', 24000, 'wav', 'audio/wav'),
+    OutputFormat('wav_44100', "WAV 44.1 kHz (Pro tier)", 'pcm_44100', 'pcm', 'wav', 44100, 'wav', 'audio/wav'),
+    OutputFormat('pcm_16000', "Raw PCM 16 kHz", 'pcm_16000', 'pcm', 'raw', 16000, 'pcm', 'audio/L16'),
+    OutputFormat('pcm_22050', "Raw PCM 22.05 kHz", 'pcm_22050', 'pcm', 'raw', 22050, 'pcm', 'audio/L16'),
+    OutputFormat('pcm_24000', "Raw PCM 24 kHz", 'pcm_24000', 'pcm', 'raw', 24000, 'pcm', 'audio/L16'),
+    OutputFormat('pcm_44100', "Raw PCM 44.1 kHz (Pro tier)", 'pcm_44100', 'pcm', 'raw', 44100, 'pcm', 'audio/L16'),
+])
+
+# Format used when none is selected, can be overridden via environment variable
+DEFAULT_OUTPUT_FORMAT = os.getenv('TTS_OUTPUT_FORMAT', 'mp3_44100_128')
+
+# Formats a browser can play (raw PCM has no header describing the audio)
+PLAYABLE_FORMATS = [name for name, audio_format in OUTPUT_FORMATS.items() if audio_format.container != 'raw']
+
+# PCM from the API is 16-bit signed little-endian mono
+SAMPLE_WIDTH = 2
+
+
+def get_output_format(name=None):
+    """
+    Return the OutputFormat for name (default DEFAULT_OUTPUT_FORMAT); raises ValueError for unknown names.
+    """
+    name = name or DEFAULT_OUTPUT_FORMAT
+    try:
+        return OUTPUT_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output format: {name}. Available: {', '.join(OUTPUT_FORMATS)}")
+
+
+# Size written into the header while the length is still unknown (streaming), fixed by finalize_wav()
+UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate, data_size=None):
+    """
+    Return the 44-byte header of a 16-bit mono PCM WAV file.
+    """
+    data_size = UNKNOWN_SIZE if data_size is None else data_size
+    riff_size = UNKNOWN_SIZE if data_size == UNKNOWN_SIZE else 36 + data_size
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', riff_size, b'WAVE', b'fmt ', 16, 1, 1, sample_rate,
+                       sample_rate * SAMPLE_WIDTH, SAMPLE_WIDTH, SAMPLE_WIDTH * 8, b'data', data_size)
+
+
+def finalize_wav(out_file):
+    """
+    Write the real sizes into the header of a WAV file that was streamed with unknown sizes.
+    """
+    out_file.flush()
+    size = out_file.seek(0, os.SEEK_END)
+    out_file.seek(4)
+    out_file.write(struct.pack('<I', size - 8))
+    out_file.seek(40)
+    out_file.write(struct.pack('<I', size - 44))
+    out_file.seek(0, os.SEEK_END)
+
+
+def finalizer_for(audio_format):
+    """
+    Return the function completing a written file of audio_format, or None if nothing is needed.
+    """
+    return finalize_wav if audio_format.container == 'wav' else None
@@ -0,0 +1,189 @@
+# Description: Non-interactive batch rendering of many text files / manifest entries with resume support.
+
+# Import the required libraries
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from tts_audio import DEFAULT_OUTPUT_FORMAT, finalizer_for, get_output_format
+from tts_cache import make_cache_key
+from tts_pipeline import synthesize_long_text
+from tts_storage import write_atomic
+from tts_synthesis import DEFAULT_MODEL
+
+# Number of jobs rendered at the same time, can be overridden via environment variable or --workers
+DEFAULT_BATCH_WORKERS = int(os.getenv('TTS_BATCH_WORKERS', 4))
+
+# One unit of work of a batch
+BatchJob = namedtuple('BatchJob', ['job_id', 'text', 'voice', 'model', 'output', 'output_format', 'postprocess'])
+
+
+def job_fingerprint(job):
+    """
+    Hash of everything that determines the audio of a job; a changed job is rendered again on resume.
+    """
+    return make_cache_key(job.text, job.voice, job.model, output_format=job.output_format, postprocess=job.postprocess)
+
+
+def load_jobs(source, default_voice=None, default_model=DEFAULT_MODEL, default_format=DEFAULT_OUTPUT_FORMAT,
+              postprocess=False):
+    """
+    Load batch jobs from a directory of .txt files or from a JSONL manifest.
+
+    Manifest lines are JSON objects with "text" and optional "voice", "model", "format", "postprocess",
+    "output" (file name) and "id" keys. Missing voices/models/formats fall back to default_voice/
+    default_model/default_format, and postprocess applies to the jobs with a PCM based format.
+    """
+    source = Path(source)
+    jobs = []
+    if source.is_dir():
+        audio_format = get_output_format(default_format)
+        for text_path in sorted(source.rglob("*.txt")):
+            relative = text_path.relative_to(source).with_suffix("")
+            jobs.append(BatchJob(
+                job_id=relative.as_posix(),
+                text=text_path.read_text(encoding='utf-8'),
+                voice=default_voice,
+                model=default_model,
+                output=f"{relative.as_posix().replace('/', '_')}.{audio_format.extension}",
+                output_format=audio_format.name,
+                postprocess=postprocess and audio_format.codec == 'pcm',
+            ))
+    else:
+        with open(source, 'r', encoding='utf-8') as manifest:
+            for line_number, line in enumerate(manifest, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                try:
+                    audio_format = get_output_format(entry.get('format') or default_format)
+                except ValueError as e:
+                    raise ValueError(f"Line {line_number} of {source}: {e}")
+                output = entry.get('output') or f"job-{line_number:06d}.{audio_format.extension}"
+                jobs.append(BatchJob(
+                    job_id=str(entry.get('id') or output),
+                    text=entry['text'],
+                    voice=entry.get('voice') or default_voice,
+                    model=entry.get('model') or default_model,
+                    output=output,
+                    output_format=audio_format.name,
+                    postprocess=bool(entry.get('postprocess', postprocess)) and audio_format.codec == 'pcm',
+                ))
+
+    # Every job needs a voice and a unique id, otherwise results could not be matched on resume
+    seen = set()
+    for job in jobs:
+        if not job.voice:
+            raise ValueError(f"Job '{job.job_id}' has no voice, set it in the manifest or pass a default voice.")
+        if job.job_id in seen:
+            raise ValueError(f"Duplicate job id '{job.job_id}' in {source}.")
+        seen.add(job.job_id)
+    return jobs
+
+
+def load_completed(results_path):
+    """
+    Return {job_id: fingerprint} of the jobs that finished successfully according to the results manifest.
+    """
+    completed = {}
+    try:
+        with open(results_path, 'r', encoding='utf-8') as results:
+            for line in results:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash, the job is simply rendered again
+                    continue
+                if result.get('status') == "ok":
+                    completed[result['job_id']] = result.get('fingerprint')
+                else:
+                    completed.pop(result.get('job_id'), None)
+    except FileNotFoundError:
+        pass
+    return completed
+
+
+class BatchRunner:
+    """
+    Renders batch jobs on a worker pool and appends one result line per job to a JSONL results manifest.
+    """
+
+    def __init__(self, client, output_dir, results_path, workers=DEFAULT_BATCH_WORKERS, cache=None, resolve_voice=None):
+        self.client = client
+        self.output_dir = Path(output_dir)
+        self.results_path = Path(results_path)
+        self.workers = workers
+        self.cache = cache
+        self.resolve_voice = resolve_voice or (lambda voice: voice)
+        self._results_lock = threading.Lock()
+
+    def pending_jobs(self, jobs):
+        """
+        Drop the jobs which already have an up-to-date output from a previous run.
+        """
+        completed = load_completed(self.results_path)
+        pending = []
+        for job in jobs:
+            if completed.get(job.job_id) == job_fingerprint(job) and (self.output_dir / job.output).is_file():
+                continue
+            pending.append(job)
+        return pending
+
+    def run(self, jobs):
+        """
+        Render all pending jobs and return a summary dict with the number of ok/failed/skipped jobs.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.results_path.parent.mkdir(parents=True, exist_ok=True)
+        pending = self.pending_jobs(jobs)
+        summary = {'total': len(jobs), 'skipped': len(jobs) - len(pending), 'ok': 0, 'failed': 0}
+        print(f"*** Batch: {len(jobs)} jobs, {summary['skipped']} already done, rendering {len(pending)} with {self.workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts-batch") as executor:
+            futures = [executor.submit(self.render, job) for job in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                summary['ok' if result['status'] == "ok" else 'failed'] += 1
+                print(f"[{done}/{len(pending)}] {result['job_id']} --> {result['status']} {result.get('error', '')}")
+        return summary
+
+    def render(self, job):
+        """
+        Render one job to its output file (atomically) and record the outcome in the results manifest.
+        """
+        started = time.time()
+        output_path = self.output_dir / job.output
+        result = {'job_id': job.job_id, 'output': str(output_path), 'fingerprint': job_fingerprint(job)}
+        try:
+            # Jobs already run in parallel, so the segments of one job are rendered one after another
+            response = synthesize_long_text(
+                self.client,
+                text=job.text,
+                voice=self.resolve_voice(job.voice),
+                model=job.model,
+                cache=self.cache,
+                max_workers=1,
+                output_format=job.output_format,
+                postprocess=job.postprocess,
+            )
+            # Written to a temporary file first, a failed job never leaves a partial output behind
+            size = write_atomic(output_path, response, finalize=finalizer_for(get_output_format(job.output_format)))
+            result.update(status="ok", bytes=size)
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        result['seconds'] = round(time.time() - started, 3)
+        self._record(result)
+        return result
+
+    def _record(self, result):
+        # Each line is flushed to disk right away, so a crash loses at most the jobs in flight
+        with self._results_lock:
+            with open(self.results_path, 'a', encoding='utf-8') as results:
+                results.write(json.dumps(result, ensure_ascii=False) + "\n")
+                results.flush()
+                os.fsync(results.fileno())
@@ -0,0 +1,241 @@
+# Description: Persistent, content-addressed cache for synthesized speech stored under audio-outputs/.
+
+# Import the required libraries
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+# Default location and limits of the cache, can be overridden via environment variables
+DEFAULT_CACHE_DIR = Path(__file__).parent / "audio-outputs" / ".cache"
+DEFAULT_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 500 * 1024 * 1024))   # 500 MB
+DEFAULT_MAX_AGE = int(os.getenv('TTS_CACHE_MAX_AGE', 7 * 24 * 3600))           # 7 days
+
+# Suffix of the cached audio entries and of the in-progress temporary files
+ENTRY_SUFFIX = ".audio"
+TEMP_SUFFIX = ".part"
+
+# Size of the chunks yielded when a cached entry is streamed back
+READ_CHUNK_SIZE = 64 * 1024
+
+# Seconds between two full scans of the cache directory (expiry, and correcting the in-memory size
+# for entries written by other processes); in between the size is tracked in memory
+EVICT_INTERVAL = int(os.getenv('TTS_CACHE_EVICT_INTERVAL', 600))
+# Eviction frees space down to this fraction of max_bytes, so a full cache is not scanned on every write
+LOW_WATER_MARK = 0.9
+
+
+def normalize_text(text):
+    """
+    Normalize text so that insignificant differences (unicode form, whitespace) map to the same cache entry.
+    """
+    text = unicodedata.normalize('NFC', text)
+    return " ".join(text.split())
+
+
+def make_cache_key(text, voice, model, output_format="mp3_44100_128", **settings):
+    """
+    Build the cache key as a SHA-256 hash of the normalized text, voice, model and output settings.
+    """
+    payload = {
+        'text': normalize_text(text),
+        'voice': voice,
+        'model': model,
+        'output_format': output_format,
+        'settings': settings,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class SynthesisCache:
+    """
+    Size and age bounded on-disk cache of synthesized audio, keyed by make_cache_key().
+
+    Entries are written to a temporary file and atomically renamed into place, so concurrent
+    sessions (threads or processes) never observe a partially written entry.
+
+    The total size is kept in memory, so a write only scans the directory when the cache is over
+    max_bytes or the last scan is more than evict_interval seconds old.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 evict_interval=EVICT_INTERVAL):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = 0
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # One scan at start-up establishes the size and removes expired entries
+        self.evict()
+
+    def path_for(self, key):
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key):
+        """
+        Return the path of a valid cached entry for key, or None on a miss.
+        """
+        path = self.path_for(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_mtime < time.time() - self.max_age:
+            with self._lock:
+                self.misses += 1
+            return None
+        # Refresh the modification time, it is used as the "last used" stamp for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def contains(self, key):
+        """
+        Return True if a valid entry for key exists, without counting a hit or a miss.
+        """
+        try:
+            return self.path_for(key).stat().st_mtime >= time.time() - self.max_age
+        except FileNotFoundError:
+            return False
+
+    def iter_chunks(self, path):
+        """
+        Stream a cached entry back in chunks, mirroring the shape of an API response.
+        """
+        with open(path, 'rb') as in_file:
+            while True:
+                chunk = in_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def put(self, key, data):
+        """
+        Atomically store data (bytes) as the entry for key and return its path.
+        """
+        for _ in self.store_stream(key, [data]):
+            pass
+        return self.path_for(key)
+
+    def store_stream(self, key, chunks):
+        """
+        Pass chunks through to the caller while writing them to the cache.
+
+        The entry is only published once the stream has been fully consumed; if the stream fails
+        or is abandoned half way, the temporary file is removed and nothing is cached.
+        """
+        fd, temp_name = tempfile.mkstemp(prefix=f"{key}-", suffix=TEMP_SUFFIX, dir=self.directory)
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as out_file:
+                for chunk in chunks:
+                    out_file.write(chunk)
+                    yield chunk
+                out_file.flush()
+                os.fsync(out_file.fileno())
+            size = os.path.getsize(temp_name)
+            path = self.path_for(key)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = None
+            os.replace(temp_name, path)
+            completed = True
+        finally:
+            if not completed:
+                try:
+                    os.remove(temp_name)
+                except OSError:
+                    pass
+        with self._lock:
+            self._bytes += size - (replaced or 0)
+            self._entries += 0 if replaced is not None else 1
+            due = self._bytes > self.max_bytes or time.time() - self._last_evict > self.evict_interval
+        if due:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries and, when the cache is over max_bytes, the least recently used ones
+        until it is below LOW_WATER_MARK of max_bytes.
+        """
+        now = time.time()
+        entries = []
+        total_bytes = 0
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.suffix == TEMP_SUFFIX:
+                # Leftovers of crashed writers are removed once they are clearly stale
+                if stat.st_mtime < now - 3600:
+                    self._remove(path)
+                continue
+            if path.suffix != ENTRY_SUFFIX:
+                continue
+            if stat.st_mtime < now - self.max_age:
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        # Oldest (least recently used) entries go first
+        entries.sort()
+        removed = 0
+        target = self.max_bytes * LOW_WATER_MARK if total_bytes > self.max_bytes else self.max_bytes
+        for _, size, path in entries:
+            if total_bytes <= target:
+                break
+            self._remove(path)
+            total_bytes -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total_bytes
+            self._entries = len(entries) - removed
+            self._last_evict = now
+
+    def stats(self):
+        """
+        Return hit/miss counters together with the current size of the cache (as tracked in memory).
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': self._entries, 'bytes': self._bytes}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+# Process-wide cache instance shared by all sessions of the apps
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide SynthesisCache, creating it on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SynthesisCache(directory=os.getenv('TTS_CACHE_DIR', DEFAULT_CACHE_DIR))
+        return _cache
@@ -0,0 +1,200 @@
+# Description: Long-lived ElevenLabs client built on a pooled httpx connection pool shared by all sessions of a process.
+
+# Import the required libraries
+import email.utils
+import os
+import threading
+import time
+
+import httpx
+
+# Connection pool settings, can be overridden via environment variables
+DEFAULT_POOL_SIZE = int(os.getenv('TTS_HTTP_POOL_SIZE', 20))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.getenv('TTS_HTTP_KEEPALIVE_EXPIRY', 60))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv('TTS_HTTP_CONNECT_TIMEOUT', 5))
+DEFAULT_READ_TIMEOUT = float(os.getenv('TTS_HTTP_READ_TIMEOUT', 60))
+
+# Alternative API endpoint, e.g. the local mock server used by the benchmarks (None = ElevenLabs production)
+API_BASE_URL = os.getenv('ELEVEN_API_BASE_URL') or None
+
+
+def http2_available():
+    """
+    HTTP/2 needs the optional "h2" package (pip install httpx[http2]).
+    """
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return os.getenv('TTS_HTTP2', '1') != '0'
+
+
+class ConnectionStats:
+    """
+    Counts requests and newly opened connections, so the connection reuse ratio can be reported.
+
+    New connections are detected through the httpcore "trace" request extension.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions['trace'] = self.trace
+
+    def trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            _connect.started = time.perf_counter()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # TCP connect and TLS handshake both count as connection setup time of this thread
+            now = time.perf_counter()
+            _connect.seconds = getattr(_connect, 'seconds', 0.0) + now - getattr(_connect, 'started', now)
+            _connect.started = now
+            if event_name == "connection.connect_tcp.complete":
+                with self._lock:
+                    self.new_connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            requests, new_connections = self.requests, self.new_connections
+        reused = max(requests - new_connections, 0)
+        return {
+            'requests': requests,
+            'new_connections': new_connections,
+            'reused_connections': reused,
+            'reuse_ratio': reused / requests if requests else 0.0,
+        }
+
+
+# Time spent opening connections, per thread (a request is sent and read on one thread)
+_connect = threading.local()
+
+
+def pop_connect_time():
+    """
+    Return and reset the time this thread spent opening new connections (TCP connect and TLS handshake).
+    """
+    seconds = getattr(_connect, 'seconds', 0.0)
+    _connect.seconds = 0.0
+    return seconds
+
+
+# Retry-After hint of the last throttled response, per thread (a request is sent and read on one thread)
+_retry_after = threading.local()
+
+
+def parse_retry_after(headers):
+    """
+    Return the number of seconds requested by the Retry-After(-ms) header, or None if there is none.
+    """
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms is not None:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    # Otherwise the header holds an HTTP date
+    retry_date = email.utils.parsedate_tz(retry_after)
+    if retry_date is None:
+        return None
+    return max(email.utils.mktime_tz(retry_date) - time.time(), 0.0)
+
+
+def record_retry_after(response):
+    if response.status_code == 429 or response.status_code >= 500:
+        _retry_after.seconds = parse_retry_after(response.headers)
+
+
+def pop_retry_after():
+    """
+    Return and clear the Retry-After hint of the last failed response sent from this thread.
+    """
+    seconds = getattr(_retry_after, 'seconds', None)
+    _retry_after.seconds = None
+    return seconds
+
+
+def create_http_client(stats, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                       read_timeout=DEFAULT_READ_TIMEOUT, http2=None):
+    """
+    Build the pooled httpx client used underneath every ElevenLabs client of the process.
+    """
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    def on_request(request):
+        stats.on_request(request)
+        # The SDK sends a flat 60 second timeout with every request, apply the configured ones instead
+        request.extensions['timeout'] = timeout.as_dict()
+
+    return httpx.Client(
+        http2=http2_available() if http2 is None else http2,
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+        ),
+        timeout=timeout,
+        event_hooks={'request': [on_request], 'response': [record_retry_after]},
+    )
+
+
+# Process-wide connection pool and default client, shared by all sessions
+_stats = ConnectionStats()
+_http_client = None
+_default_client = None
+_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Return the process-wide pooled httpx client, creating it on first use.
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = create_http_client(_stats)
+        return _http_client
+
+
+def create_client(api_key):
+    """
+    Create an ElevenLabs client for api_key which reuses the process-wide connection pool.
+    """
+    # The SDK (and pydantic underneath it) is only imported once a client is actually needed
+    from elevenlabs.client import ElevenLabs
+    return ElevenLabs(api_key=api_key, base_url=API_BASE_URL, httpx_client=get_http_client())
+
+
+def get_client():
+    """
+    Return the process-wide ElevenLabs client for the API key from the environment (ELEVEN_API_KEY).
+    """
+    global _default_client
+    http_client = get_http_client()
+    with _lock:
+        if _default_client is None:
+            from elevenlabs.client import ElevenLabs
+            _default_client = ElevenLabs(api_key=os.getenv('ELEVEN_API_KEY'), base_url=API_BASE_URL,
+                                         httpx_client=http_client)
+        return _default_client
+
+
+def connection_stats():
+    """
+    Return the connection reuse statistics together with the pool configuration.
+    """
+    stats = _stats.snapshot()
+    stats['pool_size'] = DEFAULT_POOL_SIZE
+    stats['http2'] = _http_client is not None and http2_available()
+    return stats
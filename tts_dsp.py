@@ -0,0 +1,194 @@
+# Description: Streaming, NumPy-vectorized post-processing of PCM audio - silence trimming, gap-free joins and loudness normalization.
+
+# Import the required libraries
+import numpy as np
+
+from tts_audio import SAMPLE_WIDTH
+
+# Audio is processed in blocks of this duration, so memory stays bounded for arbitrarily long audio
+BLOCK_SECONDS = 0.5
+
+
+def pcm_blocks(chunks, block_samples):
+    """
+    Re-chunk a stream of PCM bytes into float32 blocks (-1.0 .. 1.0) of block_samples samples.
+    """
+    pending = bytearray()
+    block_bytes = block_samples * SAMPLE_WIDTH
+    for chunk in chunks:
+        pending += chunk
+        while len(pending) >= block_bytes:
+            yield np.frombuffer(bytes(pending[:block_bytes]), dtype='<i2').astype(np.float32) / 32768.0
+            del pending[:block_bytes]
+    usable = len(pending) - len(pending) % SAMPLE_WIDTH
+    if usable:
+        yield np.frombuffer(bytes(pending[:usable]), dtype='<i2').astype(np.float32) / 32768.0
+
+
+def pcm_bytes(block):
+    """
+    Convert a float32 block back to 16-bit little-endian PCM, clipping out-of-range samples.
+    """
+    return (np.clip(block, -1.0, 32767 / 32768.0) * 32768.0).round().astype('<i2').tobytes()
+
+
+def trim_silence(blocks, sample_rate, threshold_db=-50.0, padding=0.1, max_held=10.0):
+    """
+    Drop leading and trailing silence, keeping padding seconds of it at both ends.
+
+    Silence after the last sound is held back until more sound follows; at most max_held seconds
+    are held, so longer trailing silence is only trimmed down to that length.
+    """
+    threshold = 10 ** (threshold_db / 20)
+    pad = int(padding * sample_rate)
+    max_held_samples = int(max_held * sample_rate)
+    started = False
+    lead = np.zeros(0, dtype=np.float32)
+    held = []
+    held_samples = 0
+    for block in blocks:
+        loud = np.flatnonzero(np.abs(block) > threshold)
+        if not started:
+            if loud.size == 0:
+                # Remember the end of the leading silence for the padding
+                lead = np.concatenate((lead, block))[-pad:] if pad else lead
+                continue
+            started = True
+            block = np.concatenate((lead, block))
+            start = max(loud[0] + len(lead) - pad, 0)
+            block = block[start:]
+            loud = loud + len(lead) - start
+        if loud.size == 0:
+            held.append(block)
+            held_samples += len(block)
+            if held_samples > max_held_samples:
+                # A long pause inside the audio, not the end of it
+                oldest = held.pop(0)
+                held_samples -= len(oldest)
+                yield oldest
+            continue
+        # Sound again: the held silence was a pause, emit it; the tail after the last sound is held
+        for silent in held:
+            yield silent
+        held = [block[loud[-1] + 1:]]
+        held_samples = len(held[0])
+        yield block[:loud[-1] + 1]
+    if held:
+        yield np.concatenate(held)[:pad]
+
+
+def crossfade_join(segments, sample_rate, fade=0.01):
+    """
+    Join the block streams of several segments into one, crossfading fade seconds at every boundary
+    so the joints have neither gaps nor clicks.
+    """
+    fade_samples = max(int(fade * sample_rate), 1)
+    tail = None
+    for blocks in segments:
+        buffer = np.zeros(0, dtype=np.float32)
+        mixed = tail is None
+        for block in blocks:
+            buffer = np.concatenate((buffer, block))
+            if not mixed:
+                if len(buffer) < len(tail):
+                    continue
+                buffer = _crossfade(tail, buffer)
+                mixed = True
+            # The end of the segment is held back to be mixed with the start of the next one
+            if len(buffer) > fade_samples:
+                yield buffer[:-fade_samples]
+                buffer = buffer[-fade_samples:]
+        if not mixed:
+            buffer = _crossfade(tail, buffer)
+        tail = buffer
+    if tail is not None and len(tail):
+        yield tail
+
+
+def _crossfade(tail, head):
+    overlap = min(len(tail), len(head))
+    if overlap == 0:
+        return np.concatenate((tail, head))
+    ramp = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+    mixed = tail[len(tail) - overlap:] * (1.0 - ramp) + head[:overlap] * ramp
+    return np.concatenate((tail[:len(tail) - overlap], mixed, head[overlap:]))
+
+
+def normalize_loudness(blocks, sample_rate, target_db=-20.0, window=3.0, max_gain_db=20.0,
+                       threshold_db=-50.0):
+    """
+    Bring the audio to target_db RMS with a slowly adapting gain and a peak limit.
+
+    The loudness is measured over the sounding blocks with a moving average of about window
+    seconds; the first window seconds are held back to measure the starting loudness. The gain
+    is ramped within every block, so gain changes never cause clicks.
+    """
+    target = 10 ** (target_db / 20)
+    max_gain = 10 ** (max_gain_db / 20)
+    threshold = 10 ** (threshold_db / 20)
+    lookahead = []
+    lookahead_samples = 0
+    mean_square = None
+    gain = None
+    smoothing = None
+
+    def measure(block):
+        nonlocal mean_square, smoothing
+        if len(block) == 0 or np.sqrt(np.mean(block * block)) < threshold:
+            return
+        block_mean_square = float(np.mean(block * block))
+        if mean_square is None:
+            mean_square = block_mean_square
+        else:
+            smoothing = smoothing or min(len(block) / (window * sample_rate), 1.0)
+            mean_square += (block_mean_square - mean_square) * smoothing
+
+    def apply(block):
+        nonlocal gain
+        if len(block) == 0:
+            return block
+        wanted = min(target / np.sqrt(mean_square), max_gain) if mean_square else 1.0
+        peak = float(np.max(np.abs(block)))
+        if peak * wanted > 0.99:
+            wanted = 0.99 / peak
+        start = wanted if gain is None else gain
+        gain = wanted
+        return block * np.linspace(start, wanted, len(block), dtype=np.float32)
+
+    for block in blocks:
+        if lookahead is not None:
+            lookahead.append(block)
+            lookahead_samples += len(block)
+            measure(block)
+            if lookahead_samples < window * sample_rate:
+                continue
+            for held in lookahead:
+                yield apply(held)
+            lookahead = None
+            continue
+        measure(block)
+        yield apply(block)
+    for held in lookahead or []:
+        yield apply(held)
+
+
+def postprocess_pcm(segments, sample_rate, trim=True, normalize=True):
+    """
+    Clean up the PCM audio of one or more segments and yield it as one continuous PCM stream.
+
+    segments is an iterable of PCM chunk iterables (one per segment, in order). Every segment is
+    trimmed of leading and trailing silence, the segments are crossfaded together and the result
+    is loudness-normalized, all in blocks of BLOCK_SECONDS.
+    """
+    block_samples = int(sample_rate * BLOCK_SECONDS)
+
+    def segment_blocks(chunks):
+        blocks = pcm_blocks(chunks, block_samples)
+        return trim_silence(blocks, sample_rate) if trim else blocks
+
+    blocks = crossfade_join((segment_blocks(chunks) for chunks in segments), sample_rate)
+    if normalize:
+        blocks = normalize_loudness(blocks, sample_rate)
+    for block in blocks:
+        if len(block):
+            yield pcm_bytes(block)
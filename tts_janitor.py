@@ -0,0 +1,239 @@
+# Description: Background janitor removing expired generated audio files, replacing the per-rerun cleanup sweep.
+
+# Import the required libraries
+import heapq
+import os
+import threading
+import time
+from pathlib import Path
+
+from tts_storage import OUTPUT_DIR
+
+# Cleanup policy, can be overridden via environment variables
+DEFAULT_MAX_AGE = int(os.getenv('TTS_OUTPUT_MAX_AGE', 600))                    # 10 minutes
+DEFAULT_MAX_BYTES = int(os.getenv('TTS_OUTPUT_MAX_BYTES', 1024 * 1024 * 1024))  # 1 GB
+DEFAULT_HOLD_TTL = int(os.getenv('TTS_OUTPUT_HOLD_TTL', 3600))                  # 1 hour
+# Temporary files of writers that crashed are removed once they have not been written to for this long
+DEFAULT_TEMP_MAX_AGE = int(os.getenv('TTS_OUTPUT_TEMP_MAX_AGE', 24 * 3600))     # 1 day
+# Files written by other processes are picked up by a full directory scan at this interval
+RESCAN_INTERVAL = int(os.getenv('TTS_OUTPUT_RESCAN_INTERVAL', 600))
+# Only generated speech files (and their temporary files) are managed, anything else in the directory is left alone
+MANAGED_PREFIXES = ("speech-", ".speech-")
+# Suffix of the temporary files written by AtomicFile
+TEMP_SUFFIX = ".part"
+
+
+def is_temp_file(path):
+    return path.name.startswith(".") and path.name.endswith(TEMP_SUFFIX)
+
+
+class OutputJanitor:
+    """
+    Single background thread per process that deletes generated files once they expire.
+
+    Files are kept in an in-memory expiry index, so the thread only touches files that are due
+    instead of listing and stat-ing the whole directory. Files held by an active session (being
+    played or downloaded) are never removed; their expiry is postponed until the hold ends.
+    When the directory grows beyond max_bytes, the oldest unheld files are removed first.
+
+    Temporary files of writes in progress are only removed once they have not been modified for
+    temp_max_age seconds, and never to enforce the quota. Every file is stat-ed again right before
+    it is deleted; a file modified since it was indexed gets a new expiry instead.
+    """
+
+    def __init__(self, directory=OUTPUT_DIR, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES,
+                 hold_ttl=DEFAULT_HOLD_TTL, temp_max_age=DEFAULT_TEMP_MAX_AGE):
+        self.directory = Path(directory).resolve()
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hold_ttl = hold_ttl
+        self.temp_max_age = temp_max_age
+        self.deleted = 0
+        self._files = {}        # path -> (size, expires_at)
+        self._heap = []         # (expires_at, path), may contain stale entries
+        self._holds = {}        # owner -> (path, held_until)
+        self._total_bytes = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._last_scan = 0.0
+
+    # --- registration --------------------------------------------------------------------
+
+    def track(self, path):
+        """
+        Add a newly written file to the expiry index.
+        """
+        path = Path(path).resolve()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+        with self._cond:
+            self._add(path, stat.st_size, self.expiry_for(path, stat.st_mtime))
+            self._cond.notify()
+
+    def hold(self, path, owner, ttl=None):
+        """
+        Protect path from deletion while owner (e.g. a Streamlit session) uses it.
+
+        An owner holds one file at a time, a new hold replaces the previous one. Holds end after
+        ttl seconds (default hold_ttl), since sessions can disappear without notice.
+        """
+        with self._cond:
+            self._holds[owner] = (Path(path).resolve(), time.time() + (self.hold_ttl if ttl is None else ttl))
+
+    def release(self, owner):
+        with self._cond:
+            hold = self._holds.pop(owner, None)
+            if hold is None:
+                return
+            path, _ = hold
+            entry = self._files.get(path)
+            if entry is not None and entry[1] > time.time() and not self.is_held(path):
+                # The expiry was postponed by the hold, go back to the expiry given by the file age
+                try:
+                    expires_at = min(entry[1], self.expiry_for(path, path.stat().st_mtime))
+                except FileNotFoundError:
+                    expires_at = time.time()
+                self._files[path] = (entry[0], expires_at)
+                heapq.heappush(self._heap, (expires_at, path))
+            self._cond.notify()
+
+    def expiry_for(self, path, mtime):
+        return mtime + (self.temp_max_age if is_temp_file(path) else self.max_age)
+
+    def is_held(self, path, now=None):
+        now = now or time.time()
+        return any(held == path and until > now for held, until in self._holds.values())
+
+    # --- background thread ---------------------------------------------------------------
+
+    def start(self):
+        """
+        Start the janitor thread if it is not running yet.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="tts-output-janitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                if time.time() - self._last_scan >= RESCAN_INTERVAL:
+                    self.scan()
+                self.sweep()
+            except Exception as e:
+                print(f"Error in output janitor: {e}")
+            with self._cond:
+                next_due = self._heap[0][0] if self._heap else time.time() + RESCAN_INTERVAL
+                timeout = min(max(next_due - time.time(), 0.5), RESCAN_INTERVAL)
+                self._cond.wait(timeout=timeout)
+
+    def scan(self):
+        """
+        Rebuild the expiry index from the directory (at start-up and every RESCAN_INTERVAL).
+        """
+        self._last_scan = time.time()
+        if not self.directory.is_dir():
+            return
+        found = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(MANAGED_PREFIXES) and entry.is_file(follow_symlinks=False):
+                    stat = entry.stat()
+                    path = Path(entry.path)
+                    found[path] = (stat.st_size, self.expiry_for(path, stat.st_mtime))
+        with self._cond:
+            self._files = {}
+            self._heap = []
+            self._total_bytes = 0
+            for path, (size, expires_at) in found.items():
+                self._add(path, size, expires_at)
+
+    def sweep(self):
+        """
+        Delete the files that are due, then enforce the total-bytes quota.
+        """
+        now = time.time()
+        due = []
+        with self._cond:
+            self._holds = {owner: hold for owner, hold in self._holds.items() if hold[1] > now}
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, path = heapq.heappop(self._heap)
+                entry = self._files.get(path)
+                if entry is None or entry[1] != expires_at:
+                    continue        # stale heap entry
+                if self.is_held(path, now):
+                    # Still in use, look at it again when the hold has ended
+                    held_until = max(until for held, until in self._holds.values() if held == path)
+                    self._files[path] = (entry[0], held_until)
+                    heapq.heappush(self._heap, (held_until, path))
+                    continue
+                due.append((path, entry[0], False))
+                self._forget(path)
+
+            if self._total_bytes > self.max_bytes:
+                for expires_at, path in sorted(self._heap):
+                    if self._total_bytes <= self.max_bytes:
+                        break
+                    if (path in self._files and self._files[path][1] == expires_at and not is_temp_file(path)
+                            and not self.is_held(path, now)):
+                        due.append((path, self._files[path][0], True))
+                        self._forget(path)
+
+        for path, size, over_quota in due:
+            # The index may be outdated (e.g. a file still being written), look at the file again
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            expires_at = self.expiry_for(path, stat.st_mtime)
+            if (expires_at > now and not over_quota) or (over_quota and stat.st_size != size):
+                with self._cond:
+                    self._add(path, stat.st_size, expires_at)
+                continue
+            try:
+                path.unlink()
+                self.deleted += 1
+                print(f"*** Deleted following old generated speech files --> {path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting file {path}: {e}")
+
+    # --- index helpers (called with the lock held) --------------------------------------
+
+    def _add(self, path, size, expires_at):
+        if path in self._files:
+            self._total_bytes -= self._files[path][0]
+        self._files[path] = (size, expires_at)
+        self._total_bytes += size
+        heapq.heappush(self._heap, (expires_at, path))
+
+    def _forget(self, path):
+        size, _ = self._files.pop(path)
+        self._total_bytes -= size
+
+    def stats(self):
+        with self._cond:
+            return {'files': len(self._files), 'bytes': self._total_bytes, 'holds': len(self._holds),
+                    'deleted': self.deleted}
+
+
+# Process-wide janitor shared by all sessions
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def get_janitor():
+    """
+    Return the process-wide janitor of the audio-outputs directory, started on first use.
+    """
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = OutputJanitor().start()
+        return _janitor
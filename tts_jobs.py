@@ -0,0 +1,160 @@
+# Description: Process-wide synthesis job queue - conversions run on a worker pool instead of the Streamlit script thread.
+
+# Import the required libraries
+import os
+import threading
+import time
+from collections import deque
+
+from tts_janitor import get_janitor
+from tts_storage import new_job_id
+from tts_stream import StreamBuffer, pump, register_stream
+
+# Worker pool size and how long finished jobs are kept, can be overridden via environment variables
+DEFAULT_WORKERS = int(os.getenv('TTS_JOB_WORKERS', 4))
+JOB_RETENTION = int(os.getenv('TTS_JOB_RETENTION', 3600))   # 1 hour
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class SynthesisJob:
+    """
+    One queued conversion. Its audio is recorded in a StreamBuffer (playable while it is being
+    generated) and written atomically to file_path.
+    """
+
+    def __init__(self, produce, file_path, owner=None, label=None, stats=None, mime="audio/mpeg", finalize=None):
+        self.job_id = new_job_id()
+        self.produce = produce
+        self.file_path = file_path
+        self.owner = owner
+        self.label = label
+        self.status = QUEUED
+        self.error = None
+        self.stats = stats if stats is not None else {}
+        self.finalize = finalize
+        self.buffer = StreamBuffer(mime=mime)
+        self.stream_id = register_stream(self.buffer)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def progress(self):
+        return {
+            'status': self.status,
+            'chunks': self.buffer.chunks_received,
+            'bytes': self.buffer.bytes_received,
+            'time_to_first_chunk': self.buffer.time_to_first_chunk(),
+        }
+
+
+class JobQueue:
+    """
+    FIFO job queue drained by a fixed pool of worker threads shared by all sessions.
+
+    Jobs are looked up by ID, so a session finds its jobs again after a rerun or a page reload.
+    Finished jobs are forgotten after retention seconds; their output files are held until then.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, retention=JOB_RETENTION):
+        self.workers = workers
+        self.retention = retention
+        self._jobs = {}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"tts-job-worker-{index}", daemon=True)
+            thread.start()
+
+    def submit(self, produce, file_path, owner=None, label=None, stats=None, mime="audio/mpeg", finalize=None):
+        """
+        Queue a job and return it right away; produce() must return the audio chunks.
+
+        stats is an optional dict the producer fills in (e.g. the segment counts of the synthesis),
+        mime is the type the stream is served with and finalize completes the written file.
+        """
+        job = SynthesisJob(produce, file_path, owner=owner, label=label, stats=stats, mime=mime, finalize=finalize)
+        # Keep the output file while the job can still be looked at
+        get_janitor().hold(file_path, owner=job.job_id)
+        with self._cond:
+            self._expire()
+            self._jobs[job.job_id] = job
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            # Sessions only poll, so expired jobs are also dropped here and not only when a job is submitted
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """
+        Return the 1-based position of a queued job, or 0 if it is not waiting anymore.
+        """
+        with self._cond:
+            try:
+                return self._pending.index(job) + 1
+            except ValueError:
+                return 0
+
+    def stats(self):
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            return {'queued': len(self._pending), 'running': running, 'workers': self.workers}
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+            try:
+                pump(job.produce(), job.buffer, file_path=job.file_path, finalize=job.finalize)
+                job.buffer.wait()
+            except Exception as e:
+                job.error = e
+                print(f"Error while running synthesis job {job.job_id}: {e}")
+            else:
+                get_janitor().track(job.file_path)
+            # The producer is not needed anymore, drop the references it holds
+            job.produce = None
+            job.finished_at = time.time()
+            if job.error is None:
+                # Keep the file as long as the finished job is listed, _expire() releases the hold
+                get_janitor().hold(job.file_path, owner=job.job_id, ttl=self.retention)
+            job.status = FAILED if job.error is not None else DONE
+
+    def _expire(self):
+        # Called with the lock held
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < now - self.retention]:
+            del self._jobs[job_id]
+            get_janitor().release(job_id)
+
+
+# Process-wide job queue shared by all sessions
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Return the process-wide JobQueue, starting its workers on first use.
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -0,0 +1,226 @@
+# Description: Per-request performance instrumentation - JSONL timing log plus Prometheus-style counters and histograms.
+
+# Import the required libraries
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Location of the timing log and address of the metrics endpoint, can be overridden via environment variables
+METRICS_LOG_PATH = Path(os.getenv('TTS_METRICS_LOG', Path(__file__).parent / "logs" / "synthesis.jsonl"))
+METRICS_HOST = os.getenv('TTS_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('TTS_METRICS_PORT', 9464))
+
+# Histogram buckets in seconds, covering cache hits (milliseconds) up to long documents (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    formatted = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        formatted.append(f'{name}="{value}"')
+    return "{" + ",".join(formatted) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets and optional labels.
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self.series.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+# Process-wide metrics of the synthesis path
+SYNTHESIS_REQUESTS = Counter('tts_synthesis_requests_total', "Synthesis requests by cache result and outcome.",
+                             labels=('cache', 'status'))
+CHARACTERS_BILLED = Counter('tts_characters_billed_total', "Characters sent to the ElevenLabs API.")
+AUDIO_BYTES = Counter('tts_audio_bytes_total', "Audio bytes delivered by the synthesis path.", labels=('cache',))
+TIME_TO_FIRST_CHUNK = Histogram('tts_time_to_first_chunk_seconds', "Time until the first audio chunk arrived.",
+                                labels=('cache',))
+STREAM_TIME = Histogram('tts_stream_seconds', "Total time to stream the audio of a request.", labels=('cache',))
+CONNECT_TIME = Histogram('tts_connect_seconds', "Time spent opening new connections to the API.")
+VOICE_CATALOG_FETCH = Histogram('tts_voice_catalog_fetch_seconds', "Time to fetch the voice catalog from the API.")
+TENANT_EVICTIONS = Counter('tts_tenant_evictions_total', "API key tenants dropped from the registry, by reason.",
+                           labels=('reason',))
+ALL_METRICS = [SYNTHESIS_REQUESTS, CHARACTERS_BILLED, AUDIO_BYTES, TIME_TO_FIRST_CHUNK, STREAM_TIME,
+               CONNECT_TIME, VOICE_CATALOG_FETCH, TENANT_EVICTIONS]
+
+
+def render_metrics():
+    """
+    Return all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Append-only JSONL log with one timing record per synthesis
+_log_lock = threading.Lock()
+
+
+def log_record(record):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock:
+            METRICS_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(METRICS_LOG_PATH, 'a', encoding='utf-8') as log_file:
+                log_file.write(line)
+    except OSError as e:
+        print(f"Error while writing metrics log {METRICS_LOG_PATH}: {e}")
+
+
+def observe_catalog_fetch(seconds):
+    VOICE_CATALOG_FETCH.observe(seconds)
+    log_record({'event': "voice_catalog_fetch", 'timestamp': time.time(), 'seconds': round(seconds, 6)})
+
+
+def track_synthesis(chunks, voice, model, chars, cache_status, pop_connect_time=None):
+    """
+    Pass chunks through while timing them, then record the request in the metrics and the JSONL log.
+
+    cache_status is "hit", "miss", "off" or "shared" (attached to an identical request in flight);
+    only requests which reach the API bill characters.
+    pop_connect_time returns the time spent opening connections by the current thread.
+    """
+    started = time.perf_counter()
+    first_chunk = None
+    size = 0
+    status = "error"
+    try:
+        for chunk in chunks:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            size += len(chunk)
+            yield chunk
+        status = "ok"
+    except GeneratorExit:
+        # The consumer stopped listening, e.g. a Streamlit rerun abandoned the request
+        status = "abandoned"
+        raise
+    finally:
+        stream_time = time.perf_counter() - started
+        connect_time = pop_connect_time() if pop_connect_time is not None else 0.0
+        billed = chars if cache_status in ("miss", "off") and status != "error" else 0
+
+        SYNTHESIS_REQUESTS.inc(cache=cache_status, status=status)
+        CHARACTERS_BILLED.inc(billed)
+        AUDIO_BYTES.inc(size, cache=cache_status)
+        if first_chunk is not None:
+            TIME_TO_FIRST_CHUNK.observe(first_chunk, cache=cache_status)
+        STREAM_TIME.observe(stream_time, cache=cache_status)
+        if connect_time:
+            CONNECT_TIME.observe(connect_time)
+        log_record({
+            'event': "synthesis",
+            'timestamp': time.time(),
+            'voice': voice,
+            'model': model,
+            'cache': cache_status,
+            'status': status,
+            'connect': round(connect_time, 6),
+            'time_to_first_chunk': round(first_chunk, 6) if first_chunk is not None else None,
+            'stream_time': round(stream_time, 6),
+            'bytes': size,
+            'characters_billed': billed,
+        })
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Process-wide metrics endpoint
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+def get_metrics_server():
+    """
+    Start the /metrics endpoint on first use and return it, or None if it is disabled or cannot be started.
+    """
+    global _server, _server_attempted
+    with _server_lock:
+        if not _server_attempted and METRICS_PORT:
+            _server_attempted = True
+            try:
+                _server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsRequestHandler)
+            except OSError as e:
+                print(f"Metrics endpoint disabled, cannot bind {METRICS_HOST}:{METRICS_PORT}: {e}")
+                return None
+            _server.daemon_threads = True
+            thread = threading.Thread(target=_server.serve_forever, name="tts-metrics-server", daemon=True)
+            thread.start()
+        return _server
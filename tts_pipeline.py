@@ -0,0 +1,306 @@
+# Description: Sentence-aware chunking and parallel synthesis pipeline for long documents.
+
+# Import the required libraries
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_audio import DEFAULT_OUTPUT_FORMAT, get_output_format, wav_header
+from tts_synthesis import DEFAULT_MODEL, synthesis_key, synthesize
+
+# Segment size and concurrency limits, can be overridden via environment variables
+DEFAULT_MAX_CHARS = int(os.getenv('TTS_MAX_SEGMENT_CHARS', 2500))
+DEFAULT_WORKERS = int(os.getenv('TTS_SYNTHESIS_WORKERS', 3))
+
+# Paragraphs are separated by blank lines, sentences end with terminal punctuation (and closing quotes or
+# brackets) followed by whitespace
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_END_RE = re.compile(r'[.!?…。！？]+["\'”’)\]]*\s+')
+# A period after one of these words or after initials ("J. R. R. Tolkien", "U.S.") does not end the sentence
+ABBREVIATIONS = frozenset((
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "ft", "vs", "cf", "fig", "no", "vol", "approx",
+    "dept", "inc", "ltd", "co", "corp", "gen", "col", "lt", "sgt", "capt", "rev", "gov", "sen", "rep",
+))
+INITIALS_RE = re.compile(r'[A-Z]\.|(?:[A-Za-z]\.){2,}')
+# Fallback break points for sentences longer than a whole segment
+CLAUSE_RE = re.compile(r'(?<=[,;:])\s+')
+
+
+def _ends_with_abbreviation(text):
+    word = text.split()[-1].lstrip("\"'“‘([")
+    return word.endswith(".") and (word[:-1].lower() in ABBREVIATIONS or INITIALS_RE.fullmatch(word) is not None)
+
+
+def split_sentences(paragraph):
+    """
+    Split a paragraph into sentences, keeping the punctuation and closing quotes with the sentence they end.
+
+    Common abbreviations and initials stay with the words that follow them.
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_RE.finditer(paragraph):
+        sentence = paragraph[start:match.end()].strip()
+        if not sentence or _ends_with_abbreviation(sentence):
+            continue
+        sentences.append(sentence)
+        start = match.end()
+    if paragraph[start:].strip():
+        sentences.append(paragraph[start:].strip())
+    return sentences
+
+
+def _hard_split(text, max_chars):
+    """
+    Split a single over-long sentence at clause boundaries, then at whitespace, as a last resort mid-word.
+    """
+    pieces = []
+    for clause in CLAUSE_RE.split(text):
+        while len(clause) > max_chars:
+            cut = clause.rfind(' ', 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return _pack(pieces, max_chars, " ")
+
+
+def _pack(pieces, max_chars, separator):
+    """
+    Greedily merge consecutive pieces into strings of at most max_chars characters.
+    """
+    packed = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            packed.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+
+def split_text(text, max_chars=DEFAULT_MAX_CHARS):
+    """
+    Split text into segments of at most max_chars characters at paragraph and sentence boundaries.
+    """
+    segments = []
+    current = ""
+    for paragraph in PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces = [paragraph]
+        else:
+            sentences = []
+            for sentence in split_sentences(paragraph):
+                sentences.extend(_hard_split(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+            pieces = _pack(sentences, max_chars, " ")
+
+        # Keep the paragraph break when a piece starts a new paragraph inside the same segment
+        separator = "\n\n"
+        for piece in pieces:
+            if current and len(current) + len(separator) + len(piece) > max_chars:
+                segments.append(current)
+                current = piece
+            else:
+                current = f"{current}{separator}{piece}" if current else piece
+            separator = " "
+    if current:
+        segments.append(current)
+    return segments
+
+
+def split_segments(text, max_chars=DEFAULT_MAX_CHARS):
+    """
+    Split text into single sentences (over-long ones at clause boundaries), the unit of incremental re-synthesis.
+    """
+    segments = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        for sentence in split_sentences(" ".join(paragraph.split())):
+            segments.extend(_hard_split(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+    return segments
+
+
+def _strip_id3(data):
+    """
+    Remove a leading ID3v2 tag and a trailing ID3v1 tag so MP3 frames can be concatenated.
+    """
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # The tag size is a 28-bit "synchsafe" integer, followed by an optional 10-byte footer
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def join_segments(segments, output_format=DEFAULT_OUTPUT_FORMAT, postprocess=False):
+    """
+    Yield the segments (an iterable of chunk iterables, in order) as one file of output_format.
+
+    For PCM based formats postprocess enables the clean-up stage of tts_dsp (silence trimming,
+    crossfaded joins and loudness normalization); MP3 segments are always joined as they are.
+    """
+    audio_format = get_output_format(output_format)
+    if audio_format.codec == 'mp3':
+        for index, chunks in enumerate(segments):
+            if index == 0:
+                # The first segment keeps its tags and can be streamed straight through
+                yield from chunks
+            else:
+                yield _strip_id3(b"".join(chunks))
+        return
+
+    if postprocess:
+        # Imported here, so NumPy is only loaded when the clean-up stage is actually used
+        from tts_dsp import postprocess_pcm
+        pcm = postprocess_pcm(segments, audio_format.sample_rate)
+    else:
+        pcm = _concat(segments)
+    if audio_format.container == 'wav':
+        # The header goes out together with the first audio, so a failed first request is raised before any
+        # byte is yielded. The sizes are not known yet, they are filled in by finalize_wav() once the file is complete
+        first_chunk = next(pcm, b"")
+        yield wav_header(audio_format.sample_rate) + first_chunk
+    yield from pcm
+
+
+def _concat(segments):
+    for chunks in segments:
+        yield from chunks
+
+
+def map_ordered(function, items, max_workers=DEFAULT_WORKERS):
+    """
+    Yield function(item) for every item in order, computed by at most max_workers threads.
+
+    Only a window of 2 * max_workers items is submitted ahead of the consumer. When the consumer
+    stops early (closes the generator) or a call fails, items that have not started yet are
+    cancelled, so an abandoned document does not keep calling (and billing) the API; at most the
+    max_workers calls already running are completed in the background.
+    """
+    items = iter(items)
+    window = 2 * max_workers
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-segment")
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                break
+        while pending:
+            result = pending.popleft().result()
+            # Keep the window full while the result is handed to the consumer
+            for item in items:
+                pending.append(executor.submit(function, item))
+                break
+            yield result
+    finally:
+        # Python 3.8 has no shutdown(cancel_futures=True), cancel the queued calls by hand
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def synthesize_segment(client, text, voice, model=DEFAULT_MODEL, cache=None, session_id=None,
+                       output_format=DEFAULT_OUTPUT_FORMAT, tenant=None):
+    """
+    Synthesize one segment to bytes; a failed request is retried by the scheduler for this segment only.
+    """
+    api_format = get_output_format(output_format).api_format
+    return b"".join(synthesize(client, text=text, voice=voice, model=model, cache=cache, session_id=session_id,
+                               output_format=api_format, tenant=tenant))
+
+
+def synthesize_segments(client, segments, voice, model=DEFAULT_MODEL, cache=None, session_id=None,
+                        output_format=DEFAULT_OUTPUT_FORMAT, max_workers=DEFAULT_WORKERS, tenant=None):
+    """
+    Yield the audio of every segment in order, as an iterable of chunks per segment (see join_segments).
+
+    The first segment is streamed while it is received, so the first audio does not wait for the
+    whole first sentence; the following segments are synthesized to bytes concurrently meanwhile.
+    """
+    api_format = get_output_format(output_format).api_format
+
+    def run(item):
+        index, segment = item
+        if index == 0:
+            # synthesize() is a generator, the request is made by the consumer when it reads the chunks
+            return synthesize(client, text=segment, voice=voice, model=model, cache=cache, session_id=session_id,
+                              output_format=api_format, tenant=tenant)
+        return [synthesize_segment(client, segment, voice, model=model, cache=cache, session_id=session_id,
+                                   output_format=output_format, tenant=tenant)]
+
+    # The results come back in submission order, so finished segments are written out as soon as
+    # all segments before them are done
+    return map_ordered(run, enumerate(segments), max_workers=max_workers)
+
+
+def synthesize_long_text(client, text, voice, model=DEFAULT_MODEL, cache=None,
+                         max_workers=DEFAULT_WORKERS, max_chars=DEFAULT_MAX_CHARS, session_id=None,
+                         output_format=DEFAULT_OUTPUT_FORMAT, postprocess=False, tenant=None):
+    """
+    Yield the audio for an arbitrarily long text.
+
+    The text is split into size-bounded segments which are synthesized concurrently by at most
+    max_workers threads and stitched back together in their original order. Texts that fit into a
+    single segment are streamed straight through without buffering.
+    """
+    segments = split_text(text, max_chars=max_chars)
+    if len(segments) <= 1:
+        api_format = get_output_format(output_format).api_format
+        chunks = synthesize(client, text=text, voice=voice, model=model, cache=cache, session_id=session_id,
+                            output_format=api_format, tenant=tenant)
+        yield from join_segments([chunks], output_format=output_format, postprocess=postprocess)
+        return
+
+    results = synthesize_segments(client, segments, voice, model=model, cache=cache, session_id=session_id,
+                                  output_format=output_format, max_workers=max_workers, tenant=tenant)
+    try:
+        yield from join_segments(results, output_format=output_format, postprocess=postprocess)
+    finally:
+        results.close()
+
+
+def synthesize_incremental(client, text, voice, model=DEFAULT_MODEL, cache=None,
+                           max_workers=DEFAULT_WORKERS, max_chars=DEFAULT_MAX_CHARS, session_id=None, stats=None,
+                           output_format=DEFAULT_OUTPUT_FORMAT, postprocess=False, tenant=None):
+    """
+    Yield the audio for text, re-using the cached audio of every sentence synthesized before.
+
+    Each sentence is synthesized and cached on its own, so after an edit only the new or changed
+    sentences are sent to the API and the audio is reassembled from the cached pieces. When stats
+    (a dict) is given, it is filled with the segment counts before the first chunk is yielded.
+    """
+    api_format = get_output_format(output_format).api_format
+    segments = split_segments(text, max_chars=max_chars)
+    if cache is None or len(segments) <= 1:
+        # Nothing to re-use between runs, synthesize the text as a whole
+        if stats is not None:
+            stats.update(segments=1, reused=0, synthesized=1, chars_synthesized=len(text))
+        chunks = synthesize(client, text=text, voice=voice, model=model, cache=cache, session_id=session_id,
+                            output_format=api_format, tenant=tenant)
+        yield from join_segments([chunks], output_format=output_format, postprocess=postprocess)
+        return
+
+    missing = [segment for segment in segments
+               if not cache.contains(synthesis_key(segment, voice, model, output_format=api_format, tenant=tenant))]
+    if stats is not None:
+        stats.update(segments=len(segments), reused=len(segments) - len(missing), synthesized=len(missing),
+                     chars_synthesized=sum(len(segment) for segment in missing))
+
+    # Cached sentences are read back from disk, the others are synthesized concurrently
+    results = synthesize_segments(client, segments, voice, model=model, cache=cache, session_id=session_id,
+                                  output_format=output_format, max_workers=max_workers, tenant=tenant)
+    try:
+        yield from join_segments(results, output_format=output_format, postprocess=postprocess)
+    finally:
+        results.close()
@@ -0,0 +1,178 @@
+# Description: Precomputed voice previews - a short sample per voice, rendered in the background and kept on disk.
+
+# Import the required libraries
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tts_storage import write_atomic
+from tts_synthesis import DEFAULT_MODEL, synthesize
+
+# Location, sample text and concurrency of the previews, can be overridden via environment variables
+PREVIEW_DIR = Path(os.getenv('TTS_PREVIEW_DIR', Path(__file__).parent / "audio-outputs" / ".previews"))
+PREVIEW_TEXT = os.getenv('TTS_PREVIEW_TEXT', "Hello! This is how I sound. I hope you like my voice.")
+PREVIEW_WORKERS = int(os.getenv('TTS_PREVIEW_WORKERS', 2))
+PREVIEWS_ENABLED = os.getenv('TTS_PREVIEWS', '1') not in ('0', 'false', 'no')
+
+# Scheduler session of the preview renders, so they queue fairly behind the requests of real sessions
+PREVIEW_SESSION = "voice-previews"
+INDEX_NAME = "index.json"
+
+
+def preview_version(voice, text=PREVIEW_TEXT, model=DEFAULT_MODEL):
+    """
+    Return the version of a voice's preview - a hash of the catalog entry and of what is rendered.
+
+    A voice whose name, category or labels change in the catalog gets a new version and is rendered again.
+    """
+    payload = {'voice': voice._asdict(), 'text': text, 'model': model}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class PreviewStore:
+    """
+    On-disk preview clips with a small JSON index {voice_id: {version, file, bytes, rendered_at}}.
+
+    sync() compares the catalog against the index and renders only the previews of new or changed
+    voices, on a pool of at most workers threads. Lookups are served from the index in memory and
+    the index is re-read when another process has updated it.
+    """
+
+    def __init__(self, directory=PREVIEW_DIR, text=PREVIEW_TEXT, model=DEFAULT_MODEL, workers=PREVIEW_WORKERS):
+        self.directory = Path(directory)
+        self.text = text
+        self.model = model
+        self.index_path = self.directory / INDEX_NAME
+        self.rendered = 0
+        self.failed = 0
+        self._index = {}
+        self._index_mtime = None
+        self._pending = set()
+        self._synced_voices = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-preview")
+        self._load_index()
+
+    def get(self, voice):
+        """
+        Return the path of the current preview of voice (a VoiceInfo), or None while it is not rendered yet.
+        """
+        if voice is None:
+            return None
+        self._load_index()
+        entry = self._index.get(voice.voice_id)
+        if entry is None or entry['version'] != preview_version(voice, self.text, self.model):
+            return None
+        return self.directory / entry['file']
+
+    def sync(self, client, voices):
+        """
+        Queue renders for the voices without a current preview and forget voices that are gone.
+
+        Calling it again with the same voices list (the catalog did not change) does nothing.
+        """
+        if voices is self._synced_voices:
+            return 0
+        self._synced_voices = voices
+        self._load_index()
+        queued = 0
+        with self._lock:
+            current = {voice.voice_id for voice in voices}
+            removed = [voice_id for voice_id in self._index if voice_id not in current]
+            for voice_id in removed:
+                self._remove_file(self._index.pop(voice_id))
+            if removed:
+                self._save_index()
+            for voice in voices:
+                version = preview_version(voice, self.text, self.model)
+                entry = self._index.get(voice.voice_id)
+                if (entry is not None and entry['version'] == version) or (voice.voice_id, version) in self._pending:
+                    continue
+                self._pending.add((voice.voice_id, version))
+                self._executor.submit(self._render, client, voice, version)
+                queued += 1
+        return queued
+
+    def stats(self):
+        with self._lock:
+            return {'previews': len(self._index), 'pending': len(self._pending), 'rendered': self.rendered,
+                    'failed': self.failed}
+
+    def _render(self, client, voice, version):
+        file_name = f"{voice.voice_id}-{version}.mp3"
+        try:
+            size = write_atomic(self.directory / file_name, synthesize(
+                client, text=self.text, voice=voice.voice_id, model=self.model, session_id=PREVIEW_SESSION))
+        except Exception as e:
+            with self._lock:
+                self._pending.discard((voice.voice_id, version))
+                self.failed += 1
+            print(f"Error while rendering the preview of voice {voice.name}: {e}")
+            return
+        with self._lock:
+            self._pending.discard((voice.voice_id, version))
+            previous = self._index.get(voice.voice_id)
+            if previous is not None and previous['file'] != file_name:
+                self._remove_file(previous)
+            self._index[voice.voice_id] = {'version': version, 'file': file_name, 'bytes': size,
+                                           'rendered_at': time.time()}
+            self.rendered += 1
+            self._save_index()
+
+    def _remove_file(self, entry):
+        try:
+            (self.directory / entry['file']).unlink()
+        except OSError:
+            pass
+
+    # --- on-disk index -------------------------------------------------------------------
+
+    def _load_index(self):
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+        try:
+            with open(self.index_path, 'r') as in_file:
+                index = json.load(in_file)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._index = index
+            self._index_mtime = mtime
+
+    def _save_index(self):
+        # Called with the lock held
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, 'w') as out_file:
+                json.dump(self._index, out_file, separators=(',', ':'))
+            os.replace(temp_name, self.index_path)
+            self._index_mtime = self.index_path.stat().st_mtime
+        except OSError as e:
+            print(f"Error while saving the voice preview index {self.index_path}: {e}")
+
+
+# Process-wide preview store shared by all sessions
+_previews = None
+_previews_lock = threading.Lock()
+
+
+def get_previews():
+    """
+    Return the process-wide PreviewStore, creating it on first use.
+    """
+    global _previews
+    with _previews_lock:
+        if _previews is None:
+            _previews = PreviewStore()
+        return _previews
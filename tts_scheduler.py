@@ -0,0 +1,218 @@
+# Description: Central, rate-limit-aware scheduler that every synthesis request to the ElevenLabs API goes through.
+
+# Import the required libraries
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import httpx
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from tts_client import pop_retry_after
+
+# Scheduler limits, can be overridden via environment variables
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv('TTS_MAX_IN_FLIGHT', 4))
+DEFAULT_CHARS_PER_MINUTE = int(os.getenv('TTS_CHARS_PER_MINUTE', 0))     # 0 disables the character budget
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('TTS_MAX_ATTEMPTS', 5))
+MAX_RETRY_DELAY = float(os.getenv('TTS_MAX_RETRY_DELAY', 30))
+
+# HTTP status codes worth retrying: throttling, timeouts and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exception):
+    """
+    Return True for throttling/server errors of the API and for network level failures.
+    """
+    if isinstance(exception, (httpx.TransportError, httpx.TimeoutException)):
+        return True
+    status_code = getattr(exception, 'status_code', None)
+    if status_code is None and isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+class wait_retry_after:
+    """
+    Tenacity wait strategy: honor the Retry-After hint of the failed response, else jittered exponential backoff.
+    """
+
+    def __init__(self, multiplier=0.5, max_delay=MAX_RETRY_DELAY):
+        self.max_delay = max_delay
+        self.backoff = wait_random_exponential(multiplier=multiplier, max=max_delay)
+
+    def __call__(self, retry_state):
+        exception = retry_state.outcome.exception()
+        retry_after = getattr(exception, 'retry_after', None)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self.backoff(retry_state)
+
+
+class TokenBucket:
+    """
+    Characters-per-minute budget; consume() blocks until enough characters are available.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """
+        Take amount characters from the bucket and return the number of seconds spent waiting for them.
+        """
+        if self.capacity <= 0:
+            return 0.0
+        # A request larger than the whole budget only has to wait for a full bucket
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FairSlots:
+    """
+    Limits the number of requests in flight; waiting requests are granted slots round-robin per session,
+    so one session submitting many requests cannot starve the others.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, session_id=None):
+        ticket = threading.Event()
+        with self._lock:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._dispatch()
+        ticket.wait()
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def queued(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _dispatch(self):
+        while self.in_flight < self.limit and self._queues:
+            # Serve the first session in line, then move it to the back if it has more requests waiting
+            session_id, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            if queue:
+                self._queues[session_id] = queue
+            self.in_flight += 1
+            ticket.set()
+
+
+class SynthesisScheduler:
+    """
+    Runs synthesis requests within a max-in-flight limit and a characters-per-minute budget,
+    retrying throttled (429) and failed (5xx, network) requests with jittered exponential backoff.
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, chars_per_minute=DEFAULT_CHARS_PER_MINUTE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.slots = FairSlots(max_in_flight)
+        self.bucket = TokenBucket(chars_per_minute)
+        self.max_attempts = max_attempts
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def stream(self, produce, chars, session_id=None):
+        """
+        Yield the chunks of produce() once a slot and enough characters are available.
+
+        A request is only retried until its first chunk arrived; after that a failure is passed
+        to the caller, since restarting would duplicate audio that was already delivered.
+        """
+        with self._lock:
+            self.requests += 1
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_retry_after(),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._count_retry,
+            reraise=True,
+        )
+        budget_taken = False
+        try:
+            for attempt in retrying:
+                with attempt:
+                    self.slots.acquire(session_id)
+                    try:
+                        if not budget_taken:
+                            waited = self.bucket.consume(chars)
+                            budget_taken = True
+                            with self._lock:
+                                self.throttled_seconds += waited
+                        chunks = iter(produce())
+                        first_chunk = next(chunks, None)
+                    except Exception as e:
+                        # Free the slot while backing off, so other requests can use it meanwhile
+                        self.slots.release()
+                        e.retry_after = pop_retry_after()
+                        raise
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+            yield from chunks
+        finally:
+            self.slots.release()
+
+    def _count_retry(self, retry_state):
+        with self._lock:
+            self.retries += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'in_flight': self.slots.in_flight,
+                'queued': self.slots.queued(),
+                'throttled_seconds': round(self.throttled_seconds, 3),
+            }
+
+
+# Process-wide scheduler shared by all sessions
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide SynthesisScheduler, creating it on first use.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SynthesisScheduler()
+        return _scheduler
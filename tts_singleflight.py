@@ -0,0 +1,113 @@
+# Description: Single-flight coalescing - identical synthesis requests in flight at the same time share one API call.
+
+# Import the required libraries
+import threading
+
+from tts_stream import StreamBuffer, pump
+
+
+class Flight:
+    """
+    One in-flight request: the buffer its chunks are recorded in and the number of attached followers.
+    """
+
+    def __init__(self):
+        self.buffer = StreamBuffer()
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests with the same key into a single producer.
+
+    The first caller (the leader) iterates the producer in its own thread, so it gets the chunks
+    without any extra hop, and records them in a StreamBuffer. Callers arriving while the request
+    is in flight follow that buffer from the first chunk on. If the leader stops listening while
+    followers are attached, the rest of the response is drained by a background thread.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, produce):
+        """
+        Return (chunks, leader). produce() is only called when no request for key is in flight.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return self._follow(flight), False
+            flight = Flight()
+            self._flights[key] = flight
+        return self._lead(key, flight, produce), True
+
+    def _lead(self, key, flight, produce):
+        handed_off = False
+        try:
+            chunks = iter(produce())
+            for chunk in chunks:
+                flight.buffer.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            with self._lock:
+                if flight.followers:
+                    # Others are still listening, finish the request for them in the background
+                    handed_off = True
+                    thread = threading.Thread(target=self._drain, args=(key, flight, chunks),
+                                              name="tts-single-flight", daemon=True)
+                    thread.start()
+            if not handed_off:
+                flight.buffer.close(error=RuntimeError("The request was abandoned"))
+            raise
+        except Exception as e:
+            flight.buffer.close(error=e)
+            raise
+        else:
+            flight.buffer.close()
+        finally:
+            if not handed_off:
+                self._forget(key, flight)
+
+    def _drain(self, key, flight, chunks):
+        try:
+            pump(chunks, flight.buffer)
+        finally:
+            self._forget(key, flight)
+
+    def _follow(self, flight):
+        try:
+            yield from flight.buffer.iter_chunks()
+            if flight.buffer.error is not None:
+                raise flight.buffer.error
+        finally:
+            with self._lock:
+                flight.followers -= 1
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+# Process-wide single-flight group shared by all sessions
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Return the process-wide SingleFlight, creating it on first use.
+    """
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -0,0 +1,81 @@
+# Description: Output storage of the generated speech files - unique job IDs and atomic writes.
+
+# Import the required libraries
+import os
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Directory of the generated speech files, can be overridden via the TTS_OUTPUT_DIR environment variable
+OUTPUT_DIR = Path(os.getenv('TTS_OUTPUT_DIR', Path(__file__).parent / "audio-outputs"))
+
+# File names handed out by new_output_path(), e.g. speech-2024-05-01_12-30-05-<32 hex digits>.mp3
+OUTPUT_NAME_PATTERN = re.compile(r'^speech-\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}-[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+def new_job_id():
+    """
+    Return a unique, sortable and unguessable ID for a synthesis job.
+    """
+    return f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}-{uuid.uuid4().hex}"
+
+
+def new_output_path(directory=OUTPUT_DIR, extension="mp3"):
+    """
+    Return the path of a new output file; concurrent sessions never get the same name.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"speech-{new_job_id()}.{extension}"
+
+
+def is_output_name(name):
+    return bool(OUTPUT_NAME_PATTERN.match(name))
+
+
+class AtomicFile:
+    """
+    Context manager writing to a temporary file next to path, which is moved into place only on success.
+
+    Readers of path therefore see either nothing or the complete file, never a partial one.
+    finalize, if given, is called with the open file before it is moved into place (e.g. to fix up a header).
+    """
+
+    def __init__(self, path, finalize=None):
+        self.path = Path(path)
+        self.finalize = finalize
+        self.temp_path = self.path.with_name(f".{self.path.name}.part")
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.temp_path, 'wb')
+        return self._file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None and self.finalize is not None:
+                self.finalize(self._file)
+            self._file.close()
+            if exc_type is None:
+                os.replace(self.temp_path, self.path)
+        finally:
+            if exc_type is not None or not self.path.exists():
+                try:
+                    self.temp_path.unlink()
+                except FileNotFoundError:
+                    pass
+        return False
+
+
+def write_atomic(path, chunks, finalize=None):
+    """
+    Write all chunks to path atomically and return the number of bytes written.
+    """
+    size = 0
+    with AtomicFile(path, finalize=finalize) as out_file:
+        for chunk in chunks:
+            out_file.write(chunk)
+            size += len(chunk)
+    return size
@@ -0,0 +1,316 @@
+# Description: Streaming playback support - in-memory stream buffers and a small local HTTP server relaying them to the browser.
+
+# Import the required libraries
+import mimetypes
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote
+
+from tts_storage import OUTPUT_DIR, AtomicFile, is_output_name
+
+# Address the media server binds to and the base URL under which the browser reaches it
+STREAM_HOST = os.getenv('TTS_STREAM_HOST', '127.0.0.1')
+STREAM_PORT = int(os.getenv('TTS_STREAM_PORT', 8502))
+STREAM_PUBLIC_URL = os.getenv('TTS_STREAM_PUBLIC_URL') or None
+
+# Finished streams stay available for replay for this many seconds
+STREAM_RETENTION = int(os.getenv('TTS_STREAM_RETENTION', 600))
+
+# Size of the blocks read from disk once a stream has been moved out of memory
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+class StreamBuffer:
+    """
+    Append-only buffer of audio chunks which any number of readers can follow while it is being filled.
+
+    Once the audio is complete on disk the chunks are released (see spill()) and readers continue
+    from the file, so a finished stream does not keep the whole clip in memory.
+    """
+
+    def __init__(self, mime="audio/mpeg"):
+        self.mime = mime
+        self.chunks = []
+        self.file_path = None
+        self.chunks_received = 0
+        self.bytes_received = 0
+        self.done = False
+        self.error = None
+        self.started_at = time.time()
+        self.first_chunk_at = None
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        with self._cond:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.time()
+            self.chunks.append(chunk)
+            self.chunks_received += 1
+            self.bytes_received += len(chunk)
+            self._cond.notify_all()
+
+    def close(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def time_to_first_chunk(self):
+        if self.first_chunk_at is None:
+            return None
+        return self.first_chunk_at - self.started_at
+
+    def wait_first_chunk(self, timeout=None):
+        """
+        Block until the first chunk arrived or the stream ended; return True if audio is available.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.first_chunk_at is not None or self.done, timeout=timeout)
+            return self.first_chunk_at is not None
+
+    def wait(self, timeout=None):
+        """
+        Block until the stream is complete; re-raise the error of the producer if it failed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout=timeout)
+        if self.error is not None:
+            raise self.error
+
+    def spill(self, file_path):
+        """
+        Release the chunks held in memory, file_path holds the complete audio from now on.
+        """
+        with self._cond:
+            self.file_path = Path(file_path)
+            self.chunks = None
+            self._cond.notify_all()
+
+    def iter_chunks(self):
+        """
+        Yield all chunks, waiting for new ones until the stream is closed.
+        """
+        index = 0
+        offset = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.chunks is None or len(self.chunks) > index or self.done)
+                if self.chunks is None:
+                    break
+                pending = self.chunks[index:]
+                finished = self.done
+            for chunk in pending:
+                yield chunk
+                offset += len(chunk)
+            index += len(pending)
+            if finished:
+                return
+
+        # The chunks were spilled to disk, continue where this reader left off
+        with open(self.file_path, 'rb') as in_file:
+            in_file.seek(offset)
+            while True:
+                block = in_file.read(FILE_BLOCK_SIZE)
+                if not block:
+                    return
+                yield block
+
+
+def pump(chunks, buffer, file_path=None, finalize=None):
+    """
+    Drain chunks into buffer and, when file_path is given, write them to disk at the same time.
+
+    The file is written atomically (finalize is passed on to AtomicFile); once it is complete the
+    buffer is served from it instead of memory.
+    """
+    try:
+        if file_path is None:
+            for chunk in chunks:
+                buffer.append(chunk)
+        else:
+            with AtomicFile(file_path, finalize=finalize) as out_file:
+                for chunk in chunks:
+                    buffer.append(chunk)
+                    out_file.write(chunk)
+    except Exception as e:
+        buffer.close(error=e)
+    else:
+        buffer.close()
+        if file_path is not None:
+            buffer.spill(file_path)
+
+
+# Registry of the streams served by the media server
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def register_stream(buffer):
+    """
+    Make buffer available under /stream/<id> and return the id; expired finished streams are dropped.
+    """
+    stream_id = uuid.uuid4().hex
+    now = time.time()
+    with _streams_lock:
+        for key in [key for key, item in _streams.items()
+                    if item.finished_at is not None and item.finished_at < now - STREAM_RETENTION]:
+            del _streams[key]
+        _streams[stream_id] = buffer
+    return stream_id
+
+
+def get_stream(stream_id):
+    with _streams_lock:
+        return _streams.get(stream_id)
+
+
+def start_stream(chunks, file_path=None, mime="audio/mpeg", finalize=None):
+    """
+    Start draining chunks in a background thread and return (stream_id, buffer) right away.
+    """
+    buffer = StreamBuffer(mime=mime)
+    stream_id = register_stream(buffer)
+    thread = threading.Thread(target=pump, args=(chunks, buffer, file_path, finalize), name="tts-stream-pump",
+                              daemon=True)
+    thread.start()
+    return stream_id, buffer
+
+
+def stream_url(stream_id):
+    return f"{STREAM_PUBLIC_URL}/stream/{stream_id}"
+
+
+def file_url(file_path, download=False):
+    """
+    URL of a finished output file; with download=True the browser saves it instead of playing it.
+    """
+    url = f"{STREAM_PUBLIC_URL}/files/{quote(Path(file_path).name)}"
+    return f"{url}?download=1" if download else url
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single "bytes=start-end" range request, or None to send the whole file.
+    """
+    match = re.match(r'^bytes=(\d*)-(\d*)$', (header or "").strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+        # Suffix range, the last n bytes
+        start = max(size - int(match.group(2)), 0)
+        end = size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /stream/<id> as a chunked HTTP response which follows the buffer as it fills up,
+    and GET /files/<name> with the finished output files, sent straight from the page cache.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == "stream":
+            self.send_stream(parts[1])
+        elif len(parts) == 2 and parts[0] == "files":
+            self.send_output_file(parts[1], download='download' in parse_qs(query))
+        else:
+            self.send_error(404)
+
+    def send_stream(self, stream_id):
+        buffer = get_stream(stream_id)
+        if buffer is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", buffer.mime)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in buffer.iter_chunks():
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The browser stopped listening (e.g. the player was closed)
+            pass
+
+    def send_output_file(self, name, download=False):
+        # Only the unguessable job files of the output directory are served
+        if not is_output_name(name):
+            self.send_error(404)
+            return
+        try:
+            in_file = open(OUTPUT_DIR / name, 'rb')
+        except OSError:
+            self.send_error(404)
+            return
+        with in_file:
+            size = os.fstat(in_file.fileno()).st_size
+            byte_range = parse_range(self.headers.get('Range'), size)
+            start, end = byte_range if byte_range else (0, size - 1)
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if download:
+                self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+            self.end_headers()
+            try:
+                # sendfile() copies from the page cache to the socket without passing through Python
+                if size:
+                    self.wfile.flush()
+                    self.connection.sendfile(in_file, offset=start, count=end - start + 1)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def log_message(self, format, *args):
+        # Keep the Streamlit console free of per-request access logs
+        pass
+
+
+# Process-wide media server shared by all sessions
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+def get_media_server():
+    """
+    Start the media server on first use and return it, or None if it is disabled or cannot be started.
+
+    The browser is pointed at the media server (streams, file links) only when its public URL is
+    configured explicitly, otherwise it may not be reachable (e.g. a container or a remote host); the
+    apps then send the audio bytes through Streamlit instead.
+    """
+    global _server, _server_attempted
+    with _server_lock:
+        if not _server_attempted and STREAM_PORT and STREAM_PUBLIC_URL:
+            _server_attempted = True
+            try:
+                _server = ThreadingHTTPServer((STREAM_HOST, STREAM_PORT), MediaRequestHandler)
+            except OSError as e:
+                print(f"Streaming playback disabled, cannot bind {STREAM_HOST}:{STREAM_PORT}: {e}")
+                return None
+            _server.daemon_threads = True
+            thread = threading.Thread(target=_server.serve_forever, name="tts-media-server", daemon=True)
+            thread.start()
+        return _server
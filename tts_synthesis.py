@@ -0,0 +1,61 @@
+# Description: Shared synthesis path used by the CLI and the Streamlit apps.
+
+# Import the required libraries
+from tts_cache import make_cache_key
+from tts_client import pop_connect_time
+from tts_metrics import track_synthesis
+from tts_scheduler import get_scheduler
+from tts_singleflight import get_single_flight
+
+# Model used for speech generation by all apps
+DEFAULT_MODEL = "eleven_multilingual_v2"
+# Audio format requested from the API unless another output format is selected
+DEFAULT_API_FORMAT = "mp3_44100_128"
+
+
+def synthesis_key(text, voice, model=DEFAULT_MODEL, output_format=DEFAULT_API_FORMAT, tenant=None):
+    """
+    Return the cache and single-flight key of a request; requests of different API key tenants never share audio.
+    """
+    if tenant is None:
+        return make_cache_key(text, voice, model, output_format=output_format)
+    return make_cache_key(text, voice, model, output_format=output_format, tenant=tenant.tenant_id)
+
+
+def synthesize(client, text, voice, model=DEFAULT_MODEL, cache=None, session_id=None, output_format=DEFAULT_API_FORMAT,
+               tenant=None):
+    """
+    Yield the audio chunks for text spoken by voice, in the API format output_format (e.g. "pcm_24000").
+
+    When a cache is given, repeated requests for the same normalized text, voice and model are
+    served from disk without touching the network, and fresh responses are stored as they stream.
+    Identical requests arriving while one is already in flight attach to it instead of calling the
+    API again. Requests to the API go through the process-wide scheduler, which queues them fairly
+    per session_id and retries throttled or failed requests.
+    Requests made with the API key of a tenant (see tts_tenants) go through the scheduler of that
+    tenant instead, and are neither cached for nor attached to the requests of other keys.
+    Timings of every request are recorded by tts_metrics.
+    """
+    def produce():
+        return client.generate(text=text, voice=voice, model=model, output_format=output_format)
+
+    def request():
+        scheduler = tenant.scheduler if tenant is not None else get_scheduler()
+        return scheduler.stream(produce, chars=len(text), session_id=session_id)
+
+    key = synthesis_key(text, voice, model, output_format=output_format, tenant=tenant)
+    if cache is None:
+        chunks, leader = get_single_flight().join(key, request)
+        cache_status = "off" if leader else "shared"
+    else:
+        cached_path = cache.get(key)
+        if cached_path is not None:
+            cache_status = "hit"
+            chunks = cache.iter_chunks(cached_path)
+        else:
+            chunks, leader = get_single_flight().join(key, lambda: cache.store_stream(key, request()))
+            cache_status = "miss" if leader else "shared"
+
+    # Every request is timed and recorded in the metrics and the JSONL timing log
+    yield from track_synthesis(chunks, voice=voice, model=model, chars=len(text), cache_status=cache_status,
+                               pop_connect_time=pop_connect_time)
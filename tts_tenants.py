@@ -0,0 +1,163 @@
+# Description: Process-wide registry of API key tenants - one client and voice catalog per key, shared by all sessions using it.
+
+# Import the required libraries
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from tts_client import create_client
+from tts_metrics import TENANT_EVICTIONS
+from tts_scheduler import SynthesisScheduler
+from voice_catalog import VoiceCatalog
+
+# Registry limits, can be overridden via environment variables
+DEFAULT_MAX_TENANTS = int(os.getenv('TTS_TENANT_MAX_ENTRIES', 500))
+DEFAULT_IDLE_TTL = int(os.getenv('TTS_TENANT_IDLE_TTL', 1800))                      # 30 minutes
+DEFAULT_MAX_BYTES = int(os.getenv('TTS_TENANT_MAX_BYTES', 64 * 1024 * 1024))       # 64 MB
+
+# Rough memory used by a tenant besides its voice catalog (client object, counters, bookkeeping)
+TENANT_OVERHEAD = 16 * 1024
+
+
+def tenant_id(api_key):
+    """
+    Return the registry key of an API key, a SHA-256 hash - the raw key is never used as an index.
+    """
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class Tenant:
+    """
+    Everything kept for one API key: its client, its voice catalog, its scheduler and usage counters.
+
+    The API limits (requests in flight, characters per minute) apply per key, so every tenant gets a
+    scheduler of its own with the TTS_MAX_IN_FLIGHT / TTS_CHARS_PER_MINUTE limits.
+    """
+
+    def __init__(self, api_key):
+        self.tenant_id = tenant_id(api_key)
+        self.client = create_client(api_key)
+        self.catalog = VoiceCatalog(fetch=self.client.voices.get_all)
+        self.scheduler = SynthesisScheduler()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lookups = 0
+        self.syntheses = 0
+        self.characters = 0
+        self.size = TENANT_OVERHEAD
+
+    def record_synthesis(self, text):
+        self.syntheses += 1
+        self.characters += len(text)
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'syntheses': self.syntheses,
+            'characters': self.characters,
+            'bytes': self.size,
+            'age': time.time() - self.created_at,
+        }
+
+
+class TenantRegistry:
+    """
+    LRU registry of tenants indexed by the hash of their API key.
+
+    Reruns of every session using a key are served from the same Tenant, so the client is created
+    and the voices are fetched once per key instead of once per session. Tenants unused for
+    idle_ttl seconds are dropped, and the least recently used ones go first when there are more
+    than max_tenants or their estimated memory exceeds max_bytes.
+    """
+
+    def __init__(self, max_tenants=DEFAULT_MAX_TENANTS, idle_ttl=DEFAULT_IDLE_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_tenants = max_tenants
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tenants = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        """
+        Return the Tenant for api_key, creating it on first use.
+        """
+        key = tenant_id(api_key)
+        with self._lock:
+            tenant = self._tenants.get(key)
+            if tenant is not None:
+                self.hits += 1
+                self._tenants.move_to_end(key)
+            else:
+                self.misses += 1
+                tenant = Tenant(api_key)
+                self._tenants[key] = tenant
+                self._bytes += tenant.size
+            tenant.lookups += 1
+            tenant.last_used = time.time()
+            # The catalog is filled (or refreshed) after the tenant is created, update its share of the memory
+            size = TENANT_OVERHEAD + tenant.catalog.estimated_size()
+            self._bytes += size - tenant.size
+            tenant.size = size
+            self._evict(keep=key)
+        return tenant
+
+    def discard(self, api_key):
+        """
+        Forget the tenant of api_key, e.g. when the key turned out to be invalid.
+        """
+        with self._lock:
+            tenant = self._tenants.pop(tenant_id(api_key), None)
+            if tenant is not None:
+                self._bytes -= tenant.size
+
+    def _evict(self, keep):
+        # Called with the lock held. The dict is in LRU order, so the scans stop at the first survivor
+        idle_before = time.time() - self.idle_ttl
+        while self._tenants:
+            key, tenant = next(iter(self._tenants.items()))
+            if key == keep:
+                break
+            if tenant.last_used < idle_before:
+                reason = "idle"
+            elif len(self._tenants) > self.max_tenants:
+                reason = "lru"
+            elif self._bytes > self.max_bytes:
+                reason = "memory"
+            else:
+                break
+            del self._tenants[key]
+            self._bytes -= tenant.size
+            self.evictions += 1
+            TENANT_EVICTIONS.inc(reason=reason)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tenants': len(self._tenants),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+# Process-wide tenant registry shared by all sessions
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tenants():
+    """
+    Return the process-wide TenantRegistry, creating it on first use.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TenantRegistry()
+        return _registry
@@ -0,0 +1,218 @@
+# Description: Process-wide, TTL-cached catalog of the ElevenLabs voices shared by all sessions of the apps.
+
+# Import the required libraries
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from tts_metrics import observe_catalog_fetch
+
+# Default refresh interval and on-disk snapshot location, can be overridden via environment variables
+DEFAULT_TTL = int(os.getenv('TTS_VOICE_CATALOG_TTL', 600))   # 10 minutes
+DEFAULT_SNAPSHOT_PATH = Path(os.getenv(
+    'TTS_VOICE_SNAPSHOT',
+    Path(__file__).parent / "audio-outputs" / ".cache" / "voices.json"
+))
+
+# Lightweight, immutable description of a voice kept in memory
+VoiceInfo = namedtuple('VoiceInfo', ['voice_id', 'name', 'category', 'labels'])
+
+
+def voices_from_response(response):
+    """
+    Convert the response of client.voices.get_all() into a list of VoiceInfo entries.
+    """
+    voices = []
+    for voice in getattr(response, 'voices', None) or []:
+        voices.append(VoiceInfo(
+            voice_id=voice.voice_id,
+            name=voice.name or voice.voice_id,
+            category=voice.category,
+            labels=dict(voice.labels or {}),
+        ))
+    return voices
+
+
+def key_fingerprint(api_key):
+    """
+    Short, non-reversible fingerprint of an API key, used to tell apart data fetched with different keys.
+    """
+    return hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()[:16]
+
+
+class VoiceCatalog:
+    """
+    In-memory voice catalog with a prebuilt name -> voice index.
+
+    Lookups are served from memory. Once the catalog is older than ttl seconds it keeps serving the
+    current data while a single background thread fetches a fresh copy (stale-while-revalidate).
+    An optional JSON snapshot on disk makes cold starts independent of the API. With ttl=None the
+    catalog is never refreshed in the background, only by explicit refresh() calls.
+    """
+
+    def __init__(self, fetch, ttl=DEFAULT_TTL, snapshot_path=None, snapshot_tag=None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_tag = snapshot_tag
+        self.fetched_at = 0.0
+        self.last_error = None
+        self._voices = []
+        self._by_name = {}
+        self._by_id = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._load_snapshot()
+
+    # --- lookups, all served from memory -------------------------------------------------
+
+    def names(self):
+        """
+        Return the unique voice names in catalog order (ready for a selectbox).
+        """
+        self._ensure_fresh()
+        return self._names
+
+    def voices(self):
+        self._ensure_fresh()
+        return self._voices
+
+    def get(self, name_or_id):
+        """
+        Return the VoiceInfo for a voice name or voice ID, or None if it is unknown.
+        """
+        self._ensure_fresh()
+        return self._by_id.get(name_or_id) or self._by_name.get(name_or_id)
+
+    def resolve(self, name_or_id):
+        """
+        Return the voice ID for a voice name or ID; unknown values are passed through unchanged.
+        """
+        voice = self.get(name_or_id)
+        return voice.voice_id if voice is not None else name_or_id
+
+    def estimated_size(self):
+        """
+        Return a rough estimate of the memory held by the catalog in bytes, without fetching anything.
+        """
+        size = 0
+        for voice in self._voices:
+            size += sys.getsizeof(voice) + sum(sys.getsizeof(field) for field in voice)
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in voice.labels.items())
+        # The name and ID indexes hold one more reference per voice
+        return size + sys.getsizeof(self._by_name) + sys.getsizeof(self._by_id) + sys.getsizeof(self._names)
+
+    # --- refreshing ----------------------------------------------------------------------
+
+    def refresh(self):
+        """
+        Fetch the voices from the API and atomically swap in the new catalog.
+        """
+        started = time.perf_counter()
+        voices = voices_from_response(self._fetch())
+        observe_catalog_fetch(time.perf_counter() - started)
+        self._install(voices, time.time())
+        self._save_snapshot()
+        return voices
+
+    def _ensure_fresh(self):
+        if not self._voices:
+            # Nothing to serve yet, the first caller has to wait for the API
+            with self._lock:
+                if not self._voices:
+                    self.refresh()
+            return
+        if self.ttl is not None and time.time() - self.fetched_at > self.ttl:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        thread = threading.Thread(target=self._background_refresh, name="voice-catalog-refresh", daemon=True)
+        thread.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+            self.last_error = None
+        except Exception as e:
+            # Keep serving the previous catalog, the next lookup after the TTL will try again
+            self.last_error = e
+            self.fetched_at = time.time()
+            print(f"Error while refreshing voice catalog: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _install(self, voices, fetched_at):
+        by_name = {}
+        by_id = {}
+        for voice in voices:
+            by_id[voice.voice_id] = voice
+            by_name.setdefault(voice.name, voice)
+        # Replace all references at once so readers never see a half-built index
+        self._voices, self._by_name, self._by_id = voices, by_name, by_id
+        self._names = list(by_name)
+        self.fetched_at = fetched_at
+
+    # --- on-disk snapshot ----------------------------------------------------------------
+
+    def _load_snapshot(self):
+        if self.snapshot_path is None:
+            return
+        try:
+            with open(self.snapshot_path, 'r') as in_file:
+                snapshot = json.load(in_file)
+        except (OSError, ValueError):
+            return
+        if snapshot.get('tag') != self.snapshot_tag:
+            return
+        voices = [VoiceInfo(**voice) for voice in snapshot.get('voices', [])]
+        if voices:
+            self._install(voices, snapshot.get('fetched_at', 0.0))
+
+    def _save_snapshot(self):
+        if self.snapshot_path is None:
+            return
+        snapshot = {
+            'tag': self.snapshot_tag,
+            'fetched_at': self.fetched_at,
+            'voices': [voice._asdict() for voice in self._voices],
+        }
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(suffix=".tmp", dir=self.snapshot_path.parent)
+            with os.fdopen(fd, 'w') as out_file:
+                json.dump(snapshot, out_file)
+            os.replace(temp_name, self.snapshot_path)
+        except OSError as e:
+            print(f"Error while saving voice catalog snapshot {self.snapshot_path}: {e}")
+
+
+# Process-wide catalog shared by all sessions using the API key from the environment
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(client, api_key=None):
+    """
+    Return the process-wide VoiceCatalog backed by client, creating it on first use.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = VoiceCatalog(
+                fetch=client.voices.get_all,
+                snapshot_path=DEFAULT_SNAPSHOT_PATH,
+                snapshot_tag=key_fingerprint(api_key),
+            )
+        return _catalog